@@ -0,0 +1,169 @@
+"""
+Phase 3: Startup and encode-latency benchmark for the embedding backends
+Each backend is measured in a fresh Python process, so import time (torch
+vs onnxruntime), model load, warm-up and resident memory are what a new
+uvicorn worker would pay. Then single-query encode latency (the /api/search
+case) and batch throughput are measured, and the ONNX embeddings are
+compared with the sentence-transformers reference (cosine similarity).
+
+Usage: python benchmark_embeddings.py [--backends sentence-transformers,onnx] [--runs 200]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+RESULT_FORMAT_VERSION = 1
+
+QUERIES = [
+    "modern navigation with search",
+    "dark hero section with gradient",
+    "simple footer with social links",
+    "Create a modern SaaS landing page for a project management tool navigation",
+    "Build a portfolio site for a freelance photographer hero",
+    "Ecommerce storefront for handmade ceramics footer",
+    "dropdown menu navbar with mega menu and call to action button",
+    "pricing table with three tiers and a highlighted plan",
+]
+
+
+def rss_mb():
+    """Current resident set size (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run_worker(backend, onnx_path, runs, batch_size):
+    """Runs in the child process; prints one JSON line"""
+    start = time.perf_counter()
+    rss_start = rss_mb()
+    import numpy as np
+    from embedding_backends import create_encoder
+    encoder = create_encoder(backend, onnx_path=onnx_path)
+    import_s = time.perf_counter() - start
+
+    encoder.warm_up()
+    ready_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(runs):
+        query = f"{QUERIES[i % len(QUERIES)]} {i}"
+        t = time.perf_counter()
+        encoder.encode(query)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    batch = [f"{QUERIES[i % len(QUERIES)]} {i}" for i in range(batch_size)]
+    t = time.perf_counter()
+    for _ in range(5):
+        encoder.encode(batch)
+    batch_s = (time.perf_counter() - t) / 5
+
+    print(json.dumps({
+        "backend": backend,
+        "startup_s": {
+            "import": round(import_s, 3),
+            "load": round(encoder.load_s, 3),
+            "warmup": round(encoder.warmup_s, 3),
+            "ready": round(ready_s, 3),
+        },
+        "rss_mb": {"start": round(rss_start, 1), "ready": round(rss_mb(), 1)},
+        "encode_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+        },
+        "batch": {"size": batch_size, "texts_per_s": round(batch_size / batch_s, 1)},
+        "embeddings": encoder.encode(QUERIES).tolist(),
+    }))
+
+
+def measure(backend, args):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", backend,
+         "--onnx-path", args.onnx_path, "--runs", str(args.runs), "--batch-size", str(args.batch_size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"backend": backend, "error": result.stderr.strip().splitlines()[-1:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend startup / latency benchmark")
+    parser.add_argument('--backends', default="sentence-transformers,onnx")
+    parser.add_argument('--onnx-path', default=None, help="Defaults to embedding_backends.DEFAULT_ONNX_PATH")
+    parser.add_argument('--runs', type=int, default=200, help="Single-query encodes to time")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', default=None, help="Result JSON path")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.onnx_path is None:
+        from embedding_backends import DEFAULT_ONNX_PATH
+        args.onnx_path = DEFAULT_ONNX_PATH
+
+    if args.worker:
+        run_worker(args.worker, args.onnx_path, args.runs, args.batch_size)
+        return
+
+    import numpy as np
+
+    print("⏱️  Embedding Backend Benchmark")
+    print("=" * 80 + "\n")
+
+    results = {}
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        print(f"🔬 {backend} (fresh process)...")
+        results[backend] = measure(backend, args)
+
+    reference = results.get("sentence-transformers", {}).get("embeddings")
+    for backend, result in results.items():
+        if "error" in result:
+            print(f"   ❌ {backend}: {result['error']}")
+            continue
+        embeddings = np.asarray(result.pop("embeddings"), dtype=np.float32)
+        if reference is not None and backend != "sentence-transformers":
+            cosine = np.sum(embeddings * np.asarray(reference, dtype=np.float32), axis=1)
+            result["agreement_cosine"] = {"min": round(float(cosine.min()), 5), "mean": round(float(cosine.mean()), 5)}
+        startup, encode = result["startup_s"], result["encode_ms"]
+        print(f"   {backend:22} ready {startup['ready']:6.2f}s (import {startup['import']:.2f}s, "
+              f"load {startup['load']:.2f}s) | RSS {result['rss_mb']['ready']:7.1f} MB | "
+              f"encode p50 {encode['p50']:6.2f}ms p95 {encode['p95']:6.2f}ms | "
+              f"batch {result['batch']['texts_per_s']:8.1f} texts/s"
+              + (f" | cosine min {result['agreement_cosine']['min']:.4f}" if "agreement_cosine" in result else ""))
+
+    report = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"runs": args.runs, "batch_size": args.batch_size, "onnx_path": args.onnx_path},
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "backends": results,
+    }
+
+    output = args.output or os.path.join(
+        "benchmark_results",
+        f"embeddings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Phase 3: Retrieval benchmark on a synthetic component library
+Generates a reproducible corpus (category and style_tags frequencies skewed
+like a real library, embeddings clustered by category and style), then for
+every search backend measures recall@k against exact brute force, latency
+percentiles and throughput. Results are written as JSON so runs can be
+diffed between releases.
+
+Backends:
+- memory:            InMemoryBackend (NumPy, exact)
+- pgvector-exact:    PgvectorBackend with no ANN index (sequential scan)
+- pgvector-hnsw:     PgvectorBackend over an HNSW index
+- pgvector-ivfflat:  PgvectorBackend over an IVFFlat index
+
+pgvector backends need DATABASE_URL; the corpus goes into a separate
+`retrieval_bench` schema, never the real components table.
+
+Usage: python benchmark_retrieval.py --size 100000 --queries 500 --k 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from dotenv import load_dotenv
+
+from search_backends import ComponentIndex, InMemoryBackend, PgvectorBackend
+
+# Load environment variables
+load_dotenv()
+
+DIM = 384
+BENCH_SCHEMA = "retrieval_bench"
+RESULT_FORMAT_VERSION = 1
+
+# Relative frequency of each category in the synthetic library
+CATEGORY_WEIGHTS = {
+    "hero": 0.20,
+    "navigation": 0.18,
+    "footer": 0.15,
+    "features": 0.12,
+    "pricing": 0.08,
+    "cta": 0.08,
+    "testimonials": 0.07,
+    "contact": 0.05,
+    "faq": 0.04,
+    "team": 0.03,
+}
+
+STYLE_TAGS = [
+    "modern", "minimal", "dark", "light", "gradient", "glassmorphism", "corporate",
+    "playful", "bold", "elegant", "responsive", "animated", "sticky", "centered",
+    "split", "grid", "card", "rounded", "shadow", "outline", "colorful", "monochrome",
+    "saas", "ecommerce", "portfolio", "blog", "startup", "agency", "tailwind", "daisyui",
+]
+
+ALL_BACKENDS = ["memory", "pgvector-exact", "pgvector-hnsw", "pgvector-ivfflat"]
+
+
+# ============================================
+# Synthetic corpus
+# ============================================
+
+class SyntheticLibrary:
+    """Embeddings = category centroid + style centroids + noise, normalized.
+
+    Style tag popularity follows a Zipf-like curve, and queries are drawn
+    from the same process, so near neighbours share category and style.
+    """
+
+    def __init__(self, seed=42):
+        self.rng = np.random.default_rng(seed)
+        self.categories = list(CATEGORY_WEIGHTS)
+        self.category_p = np.array(list(CATEGORY_WEIGHTS.values()))
+        self.category_p /= self.category_p.sum()
+        self.tag_p = 1.0 / np.arange(1, len(STYLE_TAGS) + 1)
+        self.tag_p /= self.tag_p.sum()
+
+        self.category_centroids = self._unit(self.rng.standard_normal((len(self.categories), DIM)))
+        self.tag_centroids = self._unit(self.rng.standard_normal((len(STYLE_TAGS), DIM)))
+
+    @staticmethod
+    def _unit(matrix):
+        return (matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)).astype(np.float32)
+
+    def _sample(self, n, noise):
+        categories = self.rng.choice(len(self.categories), size=n, p=self.category_p)
+
+        # 2-5 distinct tags per component, weighted by popularity (Gumbel top-k)
+        counts = self.rng.integers(2, 6, size=n)
+        keys = np.log(self.tag_p) + self.rng.gumbel(size=(n, len(STYLE_TAGS)))
+        order = np.argsort(-keys, axis=1)
+        chosen = np.arange(len(STYLE_TAGS)) < counts[:, None]
+        multi_hot = np.zeros((n, len(STYLE_TAGS)), dtype=np.float32)
+        np.put_along_axis(multi_hot, order, chosen.astype(np.float32), axis=1)
+        tags = [[STYLE_TAGS[t] for t in order[row, :counts[row]]] for row in range(n)]
+
+        vectors = self.category_centroids[categories] + 0.5 * (multi_hot @ self.tag_centroids)
+        vectors += noise * self.rng.standard_normal((n, DIM)).astype(np.float32)
+        return [self.categories[c] for c in categories], tags, self._unit(vectors)
+
+    def components(self, n, chunk_size=10000):
+        """Yield (categories, style_tags, embeddings) chunks for n components"""
+        for start in range(0, n, chunk_size):
+            yield self._sample(min(chunk_size, n - start), noise=0.35)
+
+    def queries(self, n, filtered_fraction=0.8):
+        """Query embeddings; most are category-filtered like the pipeline's"""
+        categories, _, vectors = self._sample(n, noise=0.45)
+        filtered = self.rng.random(n) < filtered_fraction
+        return [c if f else None for c, f in zip(categories, filtered)], vectors
+
+
+def ground_truth(matrix, row_categories, query_categories, queries, k):
+    """Exact top-k row indices per query (independent of the backends under test)"""
+    rows_by_category = {}
+    for row, category in enumerate(row_categories):
+        rows_by_category.setdefault(category, []).append(row)
+    rows_by_category = {c: np.array(r) for c, r in rows_by_category.items()}
+
+    truth = []
+    for category, query in zip(query_categories, queries):
+        rows = rows_by_category.get(category, np.array([], dtype=int)) if category else None
+        scores = (matrix[rows] if rows is not None else matrix) @ query
+        top = np.argsort(-scores)[:k]
+        truth.append(set((rows[top] if rows is not None else top).tolist()))
+    return truth
+
+
+# ============================================
+# Measurement
+# ============================================
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+async def measure(search, ids, query_categories, queries, truth, k, concurrency):
+    """Sequential pass for latency + recall, concurrent pass for throughput"""
+    latencies = []
+    recalls = []
+    short = 0  # queries answered with fewer rows than exist (filter starved the ANN scan)
+    for category, query, expected in zip(query_categories, queries, truth):
+        start = time.perf_counter()
+        results = await search(query, category, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {ids[r['id']] for r in results}
+        recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+        short += len(results) < len(expected)
+    filtered = [r for r, c in zip(recalls, query_categories) if c is not None]
+    unfiltered = [r for r, c in zip(recalls, query_categories) if c is None]
+
+    pending = list(zip(query_categories, queries))
+
+    async def worker():
+        while pending:
+            category, query = pending.pop()
+            await search(query, category, k)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        f"recall@{k}_filtered": round(float(np.mean(filtered)), 4) if filtered else None,
+        f"recall@{k}_unfiltered": round(float(np.mean(unfiltered)), 4) if unfiltered else None,
+        "short_results": short,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(float(np.mean(latencies)), 3),
+        },
+        "qps": round(len(queries) / elapsed, 1) if elapsed else 0.0,
+        "concurrency": concurrency,
+    }
+
+
+# ============================================
+# pgvector setup
+# ============================================
+
+def synthetic_records(start, categories, tags, embeddings):
+    for offset, (category, style_tags, embedding) in enumerate(zip(categories, tags, embeddings)):
+        component_id = f"bench-{start + offset:07d}"
+        yield {
+            "id": component_id,
+            "filename": f"{component_id}.tsx",
+            "category": category,
+            "style_tags": style_tags,
+            "color_scheme": [],
+            "complexity": "simple",
+            "props_schema": {},
+            "dependencies": [],
+            "description": f"Synthetic {category} ({', '.join(style_tags)})",
+            "source": "synthetic",
+            "code": "export const Component = () => null;",
+            "code_tokens": 8,
+            "interface_view": "export declare const Component: React.FC;",
+            "interface_tokens": 8,
+            "embedding": embedding,
+        }
+
+
+def load_bench_table(database_url, chunks):
+    """(Re)create retrieval_bench.components and bulk load the corpus"""
+    import psycopg2
+    from bulk_load import load_components
+
+    conn = psycopg2.connect(database_url, options=f"-c search_path={BENCH_SCHEMA},public")
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA};")
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.components;")
+    cursor.execute(f"""
+        CREATE TABLE {BENCH_SCHEMA}.components (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            category TEXT NOT NULL,
+            style_tags TEXT[] NOT NULL,
+            color_scheme TEXT[] NOT NULL,
+            complexity TEXT NOT NULL,
+            props_schema JSONB NOT NULL,
+            dependencies TEXT[] NOT NULL,
+            description TEXT NOT NULL,
+            source TEXT NOT NULL,
+            code TEXT NOT NULL,
+            code_tokens INTEGER,
+            interface_view TEXT,
+            interface_tokens INTEGER,
+            embedding vector({DIM}) NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    cursor.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.components(category);")
+    conn.commit()
+
+    start = time.perf_counter()
+    loaded = 0
+    for categories, tags, embeddings in chunks:
+        load_components(cursor, synthetic_records(loaded, categories, tags, embeddings))
+        conn.commit()
+        loaded += len(categories)
+    cursor.execute("ANALYZE components;")
+    conn.commit()
+    load_s = time.perf_counter() - start
+
+    cursor.close()
+    return conn, load_s
+
+
+def build_bench_index(conn, method, row_count):
+    from vector_index import build_index, plan_index
+
+    plan = plan_index(row_count, method)
+    conn.commit()
+    conn.autocommit = True
+    start = time.perf_counter()
+    build_index(conn, plan, row_count, schema=BENCH_SCHEMA)
+    return plan, time.perf_counter() - start
+
+
+async def run_pgvector(database_url, variant, ids, query_categories, queries, truth, args):
+    from db_pool import ConnectionPool
+
+    async def init(conn):
+        await conn.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+
+    pool = ConnectionPool(database_url, min_size=1, max_size=args.concurrency, init=init)
+    await pool.open()
+    backend = PgvectorBackend(pool.connection, index_refresh_interval=float('inf'))
+    await backend.load_index_info()
+
+    results = []
+    efforts = args.efforts if variant != "exact" else [1.0]
+    for effort in efforts:
+        async def search(query, category, k, effort=effort):
+            return await backend.search(query, category=category, limit=k, effort=effort)
+
+        metrics = await measure(search, ids, query_categories, queries, truth, args.k, args.concurrency)
+        metrics["effort"] = effort
+        metrics["settings"] = backend.search_settings(args.k, effort)
+        results.append(metrics)
+
+    await pool.close()
+    return backend.index_info, results
+
+
+# ============================================
+# Main
+# ============================================
+
+def print_row(name, metrics, k):
+    latency = metrics["latency_ms"]
+    filtered = metrics.get(f"recall@{k}_filtered")
+    print(f"   {name:28} recall@{k} {metrics[f'recall@{k}']:.4f} "
+          f"(filtered {filtered if filtered is not None else '-'}, short {metrics['short_results']}) | "
+          f"p50 {latency['p50']:8.2f}ms  p95 {latency['p95']:8.2f}ms  p99 {latency['p99']:8.2f}ms | "
+          f"{metrics['qps']:9.1f} qps")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Retrieval benchmark on a synthetic library")
+    parser.add_argument('--size', type=int, default=10000, help="Synthetic components (10k-1M)")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--backends', default=",".join(ALL_BACKENDS))
+    parser.add_argument('--efforts', default="0.5,1,2", help="ANN effort multipliers to sweep")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="Result JSON path")
+    args = parser.parse_args()
+    args.efforts = [float(e) for e in args.efforts.split(',')]
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = set(backends) - set(ALL_BACKENDS)
+    if unknown:
+        raise SystemExit(f"Unknown backends: {sorted(unknown)} (expected {ALL_BACKENDS})")
+
+    print("📏 Retrieval Benchmark")
+    print("=" * 80 + "\n")
+
+    # Corpus
+    print(f"🧪 Generating {args.size} synthetic components (seed {args.seed})...")
+    library = SyntheticLibrary(args.seed)
+    start = time.perf_counter()
+    chunks = list(library.components(args.size))
+    row_categories = [c for categories, _, _ in chunks for c in categories]
+    row_tags = [t for _, tags, _ in chunks for t in tags]
+    matrix = np.concatenate([embeddings for _, _, embeddings in chunks])
+    ids = {f"bench-{row:07d}": row for row in range(args.size)}
+    print(f"✅ Generated in {time.perf_counter() - start:.1f}s\n")
+
+    query_categories, queries = library.queries(args.queries)
+    print(f"🎯 Computing exact top-{args.k} for {args.queries} queries...")
+    truth = ground_truth(matrix, row_categories, query_categories, queries, args.k)
+    print("✅ Ground truth ready\n")
+
+    report = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "size": args.size, "queries": args.queries, "k": args.k, "dim": DIM,
+            "concurrency": args.concurrency, "seed": args.seed, "efforts": args.efforts,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "backends": {},
+    }
+
+    print("📊 Results:")
+
+    if "memory" in backends:
+        backend = InMemoryBackend(connection=None)
+        start = time.perf_counter()
+        backend.index = ComponentIndex(list(ids), row_categories, [""] * args.size, row_tags, matrix)
+        build_s = time.perf_counter() - start
+
+        async def search(query, category, k):
+            return await backend.search(query, category=category, limit=k)
+
+        metrics = await measure(search, ids, query_categories, queries, truth, args.k, args.concurrency)
+        metrics["build_s"] = round(build_s, 3)
+        report["backends"]["memory"] = [metrics]
+        print_row("memory", metrics, args.k)
+
+    pg_variants = [b.split('-', 1)[1] for b in backends if b.startswith("pgvector-")]
+    database_url = os.getenv('DATABASE_URL')
+    if pg_variants and not database_url:
+        print("   ⚠️  DATABASE_URL not set, skipping pgvector backends")
+    elif pg_variants:
+        conn, load_s = load_bench_table(database_url, chunks)
+        report["pgvector_load_s"] = round(load_s, 3)
+
+        for variant in pg_variants:
+            plan, build_s = build_bench_index(conn, "none" if variant == "exact" else variant, args.size)
+            index_info, results = await run_pgvector(
+                database_url, variant, ids, query_categories, queries, truth, args
+            )
+            for metrics in results:
+                metrics["build_s"] = round(build_s, 3)
+                metrics["index"] = index_info
+                print_row(f"pgvector-{variant} (x{metrics['effort']})", metrics, args.k)
+            report["backends"][f"pgvector-{variant}"] = results
+
+        conn.close()
+
+    output = args.output or os.path.join(
+        "benchmark_results",
+        f"retrieval_{args.size}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
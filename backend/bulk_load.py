@@ -0,0 +1,204 @@
+"""
+Phase 2: Bulk loader for the components table
+Rows are streamed with binary COPY into a temporary staging table (no WAL,
+no text formatting of 384 floats per row), then merged into components with
+one INSERT ... SELECT ... ON CONFLICT that only rewrites rows whose content
+actually differs. Unchanged rows are left alone, so re-uploading an
+unchanged library writes (almost) nothing.
+
+Used by upload_to_db.py and ingest_components.py.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+
+# Type OIDs needed for binary array headers
+TEXT_OID = 25
+FLOAT4_OID = 700
+
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
+# (column, staging table type)
+COLUMNS = [
+    ("id", "TEXT"),
+    ("filename", "TEXT"),
+    ("category", "TEXT"),
+    ("style_tags", "TEXT[]"),
+    ("color_scheme", "TEXT[]"),
+    ("complexity", "TEXT"),
+    ("props_schema", "JSONB"),
+    ("dependencies", "TEXT[]"),
+    ("description", "TEXT"),
+    ("source", "TEXT"),
+    ("code", "TEXT"),
+    ("code_tokens", "INTEGER"),
+    ("interface_view", "TEXT"),
+    ("interface_tokens", "INTEGER"),
+    ("embedding", "REAL[]"),
+]
+
+# Every column except the key; compared to decide whether a row changed
+CONTENT_COLUMNS = [name for name, _ in COLUMNS if name != "id"]
+
+# Added after the original schema; (column, type) for ensure_columns()
+ADDED_COLUMNS = [
+    ("code_tokens", "INTEGER"),
+    ("interface_view", "TEXT"),
+    ("interface_tokens", "INTEGER"),
+]
+
+
+def ensure_columns(cursor):
+    """Add columns newer than the caller's components table (psycopg2 cursor).
+
+    Databases created before token counts were stored lack them, and the
+    COPY (and the API's retrieval query) would fail. Returns the added names;
+    ALTER TABLE only runs, and only locks the table, when something is missing.
+    """
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'components';
+    """)
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [(name, column_type) for name, column_type in ADDED_COLUMNS if name not in existing]
+    if missing:
+        cursor.execute("ALTER TABLE components " + ", ".join(
+            f"ADD COLUMN IF NOT EXISTS {name} {column_type}" for name, column_type in missing
+        ) + ";")
+    return [name for name, _ in missing]
+
+
+# ============================================
+# Binary COPY encoding
+# ============================================
+
+def _text(value) -> bytes:
+    return value.encode('utf-8')
+
+
+def _int4(value) -> bytes:
+    return struct.pack('>i', value)
+
+
+def _jsonb(value) -> bytes:
+    # jsonb binary format = version byte (1) + JSON text
+    return b'\x01' + json.dumps(value).encode('utf-8')
+
+
+def _text_array(values) -> bytes:
+    if not values:
+        return struct.pack('>iii', 0, 0, TEXT_OID)
+    parts = [struct.pack('>iiiii', 1, 0, TEXT_OID, len(values), 1)]
+    for value in values:
+        data = value.encode('utf-8')
+        parts.append(struct.pack('>i', len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def _float4_array(values) -> bytes:
+    vector = np.asarray(values, dtype=np.float32)
+    # Each element is (int32 length = 4, big-endian float4)
+    elements = np.empty(len(vector), dtype=[('length', '>i4'), ('value', '>f4')])
+    elements['length'] = 4
+    elements['value'] = vector
+    return struct.pack('>iiiii', 1, 0, FLOAT4_OID, len(vector), 1) + elements.tobytes()
+
+
+ENCODERS = {
+    "TEXT": _text,
+    "TEXT[]": _text_array,
+    "JSONB": _jsonb,
+    "INTEGER": _int4,
+    "REAL[]": _float4_array,
+}
+
+
+def encode_row(component) -> bytes:
+    """One component dict as a binary COPY tuple"""
+    parts = [struct.pack('>h', len(COLUMNS))]
+    for name, column_type in COLUMNS:
+        value = component.get(name)
+        if value is None:
+            parts.append(struct.pack('>i', -1))
+            continue
+        data = ENCODERS[column_type](value)
+        parts.append(struct.pack('>i', len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+class CopyStream:
+    """File-like object that encodes components lazily as COPY reads it,
+    so the binary payload is never materialized in full"""
+
+    def __init__(self, components):
+        self._rows = iter(components)
+        self._buffer = bytearray(COPY_SIGNATURE + struct.pack('>ii', 0, 0))
+        self._finished = False
+        self.rows = 0
+
+    def read(self, size=-1):
+        while not self._finished and (size < 0 or len(self._buffer) < size):
+            component = next(self._rows, None)
+            if component is None:
+                self._buffer += struct.pack('>h', -1)
+                self._finished = True
+            else:
+                self._buffer += encode_row(component)
+                self.rows += 1
+
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+# ============================================
+# Staging table + merge
+# ============================================
+
+def load_components(cursor, components):
+    """Stream components into a staging table and merge the changed ones.
+
+    Runs inside the caller's transaction (the staging table is dropped on
+    commit). Returns (inserted_ids, updated_ids, unchanged_count).
+    """
+    column_list = ", ".join(name for name, _ in COLUMNS)
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE components_staging (
+            {", ".join(f"{name} {column_type}" for name, column_type in COLUMNS)}
+        ) ON COMMIT DROP;
+    """)
+
+    stream = CopyStream(components)
+    cursor.copy_expert(
+        f"COPY components_staging ({column_list}) FROM STDIN WITH (FORMAT binary)",
+        stream
+    )
+
+    # Skip the write entirely when every content column is identical
+    cursor.execute(f"""
+        INSERT INTO components ({column_list})
+        SELECT {", ".join(name if name != "embedding" else "embedding::vector" for name, _ in COLUMNS)}
+        FROM components_staging
+        ON CONFLICT (id) DO UPDATE SET
+            {", ".join(f"{name} = EXCLUDED.{name}" for name in CONTENT_COLUMNS)},
+            updated_at = NOW()
+        WHERE ({", ".join(f"components.{name}" for name in CONTENT_COLUMNS)})
+              IS DISTINCT FROM
+              ({", ".join(f"EXCLUDED.{name}" for name in CONTENT_COLUMNS)})
+        RETURNING id, (xmax = 0) AS inserted;
+    """)
+
+    inserted_ids, updated_ids = [], []
+    for component_id, inserted in cursor.fetchall():
+        (inserted_ids if inserted else updated_ids).append(component_id)
+
+    unchanged = stream.rows - len(inserted_ids) - len(updated_ids)
+    return inserted_ids, updated_ids, unchanged
@@ -0,0 +1,261 @@
+"""
+Phase 3: In-process cache of component code for the generation path
+The same popular components are fetched for most generations and their code
+rarely changes, so code, props_schema and token counts are kept in memory,
+keyed by component id and versioned by updated_at.
+
+- Bounded by total bytes (LRU eviction)
+- Callers pass the updated_at they saw (pgvector's retrieval query, or the
+  in-memory index snapshot) and get a miss on an older entry, so results are
+  never older than the row they saw
+- Writes to components fire a NOTIFY (triggers installed by setup_database.py,
+  upload_to_db.py and ingest_components.py); a dedicated LISTEN connection
+  evicts changed ids, and the whole cache is dropped whenever that connection
+  has to reconnect. Rows read while an invalidation arrived are not cached.
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+
+import asyncpg
+
+import metrics
+import tracing
+
+
+CHANNEL = "component_changes"
+
+# Statement-level triggers: one NOTIFY per statement, not per row. Payloads
+# over the 8000-byte NOTIFY limit are sent without ids (= flush everything).
+NOTIFY_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_component_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    changed TEXT[];
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id) INTO changed FROM old_rows;
+    ELSE
+        SELECT array_agg(id) INTO changed FROM new_rows;
+    END IF;
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+    payload := json_build_object('op', TG_OP, 'ids', changed)::text;
+    IF octet_length(payload) > 7900 THEN
+        payload := json_build_object('op', TG_OP, 'ids', NULL)::text;
+    END IF;
+    PERFORM pg_notify('{CHANNEL}', payload);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS components_notify_insert ON components;
+DROP TRIGGER IF EXISTS components_notify_update ON components;
+DROP TRIGGER IF EXISTS components_notify_delete ON components;
+
+CREATE TRIGGER components_notify_insert AFTER INSERT ON components
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_component_changes();
+CREATE TRIGGER components_notify_update AFTER UPDATE ON components
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_component_changes();
+CREATE TRIGGER components_notify_delete AFTER DELETE ON components
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_component_changes();
+"""
+
+FIELDS = ("code", "props_schema", "description", "updated_at",
+          "code_tokens", "interface_view", "interface_tokens")
+
+
+def ensure_notify_trigger(cursor):
+    """Install the NOTIFY triggers on components if missing (psycopg2 cursor).
+
+    Returns True if they were (re)created. Existing triggers are left alone,
+    so loaders can call this on every run without taking a table lock.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM pg_trigger
+        WHERE tgrelid = 'components'::regclass AND tgname LIKE 'components_notify_%';
+    """)
+    if cursor.fetchone()[0] == 3:
+        return False
+    cursor.execute(NOTIFY_TRIGGER_SQL)
+    return True
+
+
+def _not_older(cached, expected):
+    return cached is not None and cached >= expected
+
+
+def _entry_size(record):
+    size = 200  # dict + key overhead, roughly
+    for field in ("code", "interface_view", "description"):
+        size += len(record.get(field) or "")
+    size += len(json.dumps(record.get("props_schema")))
+    return size
+
+
+class ComponentCodeCache:
+    """id -> component record, LRU-bounded by bytes.
+
+    Args:
+        connection: `async with connection() as conn` factory (the API pool), used for misses
+        dsn: Connection string for the LISTEN connection (None = no invalidation listener)
+        max_bytes: Approximate memory budget for cached records
+        reconnect_delay: Seconds between LISTEN reconnect attempts
+        tracer: tracing.Tracer for the miss query's "db.code_fetch" span
+    """
+
+    def __init__(self, connection, dsn=None, max_bytes=64 * 1024 * 1024, reconnect_delay=5.0,
+                 tracer=None):
+        self.connection = connection
+        self.tracer = tracer or tracing.Tracer(enabled=False)
+        self.dsn = dsn
+        self.max_bytes = max_bytes
+        self.reconnect_delay = reconnect_delay
+
+        self._entries = OrderedDict()  # id -> (size, record)
+        self._bytes = 0
+        self._listening = False
+        self._generation = 0  # bumped by every invalidation
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.flushes = 0
+
+    # ----------------------------------------
+    # Lookups
+    # ----------------------------------------
+
+    async def get_many(self, ids, versions=None):
+        """Records for `ids` (missing components are left out).
+
+        `versions` maps id -> updated_at the caller already saw; a cached
+        entry older than that counts as stale and is re-read.
+        """
+        versions = versions or {}
+        found, missing = {}, []
+        for component_id in dict.fromkeys(ids):
+            entry = self._entries.get(component_id)
+            expected = versions.get(component_id)
+            if entry is not None and (expected is None or _not_older(entry[1]["updated_at"], expected)):
+                self._entries.move_to_end(component_id)
+                found[component_id] = entry[1]
+                self.hits += 1
+            else:
+                if entry is not None:
+                    self.stale += 1
+                self.misses += 1
+                missing.append(component_id)
+
+        if missing:
+            generation = self._generation
+            with metrics.stage_timer("code_fetch"), \
+                    self.tracer.span("db.code_fetch", ids=len(missing), cache="component") as span:
+                async with self.connection() as conn:
+                    rows = await conn.fetch(f"""
+                        SELECT id, {", ".join(FIELDS)}
+                        FROM components
+                        WHERE id = ANY($1::text[]);
+                    """, missing)
+                span.set(rows=len(rows))
+            # A NOTIFY handled while the query ran may be for rows it read
+            # before the change committed; return them, but don't cache them
+            cacheable = generation == self._generation
+            for row in rows:
+                record = {field: row[i + 1] for i, field in enumerate(FIELDS)}
+                found[row[0]] = record
+                if cacheable:
+                    self._put(row[0], record)
+
+        return found
+
+    def _put(self, component_id, record):
+        size = _entry_size(record)
+        if size > self.max_bytes:
+            return
+        self._drop(component_id)
+        self._entries[component_id] = (size, record)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _drop(self, component_id):
+        entry = self._entries.pop(component_id, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+            return True
+        return False
+
+    def invalidate(self, ids):
+        self._generation += 1
+        for component_id in ids:
+            if self._drop(component_id):
+                self.invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._bytes = 0
+        self.flushes += 1
+
+    # ----------------------------------------
+    # LISTEN/NOTIFY invalidation
+    # ----------------------------------------
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            ids = json.loads(payload).get("ids")
+        except (ValueError, AttributeError):
+            ids = None
+        if ids is None:
+            self.clear()
+        else:
+            self.invalidate(ids)
+
+    async def run_listener(self):
+        """Background task: hold a LISTEN connection until cancelled"""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                # Changes made while we were not listening are unknown
+                self.clear()
+                self._listening = True
+                while not conn.is_closed():
+                    await asyncio.sleep(self.reconnect_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Component cache listener disconnected: {e}")
+            finally:
+                self._listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "listening": self._listening,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,266 @@
+"""
+Phase 3: Bounded async PostgreSQL connection pool for the FastAPI backend
+Shared by the search, code fetch and health paths so requests reuse
+connections instead of paying a TLS + auth handshake every time.
+
+- min/max pool size
+- connections validated on checkout (after sitting idle)
+- connections recycled by age
+- stats (in use, waiting, wait time) for /health and /metrics
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout"""
+
+
+class _PooledConnection:
+    """A raw connection plus the timestamps the pool needs to manage it"""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Bounded pool of asyncpg connections for a single event loop.
+
+    Args:
+        dsn: PostgreSQL connection string
+        min_size: Connections opened by open() and kept around
+        max_size: Hard cap on open connections; callers wait beyond it
+        max_lifetime: Seconds after which a connection is closed and replaced
+        validate_after: Idle seconds after which a connection is pinged on checkout
+        timeout: Seconds to wait for a free connection before PoolTimeout
+        init: Optional `async def init(conn)` run on every new connection
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, max_lifetime=1800.0,
+                 validate_after=5.0, timeout=10.0, init=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+        self.timeout = timeout
+        self.init = init
+
+        self._cond = asyncio.Condition()
+        self._idle = deque()
+        self._size = 0          # open connections (idle + in use + being created)
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "validation_failures": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    # ----------------------------------------
+    # Lifecycle
+    # ----------------------------------------
+
+    async def open(self):
+        """Pre-open min_size connections"""
+        missing = max(self.min_size - self._size, 0)
+        self._size += missing
+
+        for _ in range(missing):
+            try:
+                pooled = await self._connect()
+            except Exception:
+                async with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            async with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    async def close(self):
+        """Close idle connections; in-use ones are closed when released"""
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for pooled in idle:
+            await self._discard(pooled.conn)
+
+    # ----------------------------------------
+    # Checkout / return
+    # ----------------------------------------
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection: `async with pool.connection() as conn: ...`"""
+        pooled = await self._acquire()
+        try:
+            yield pooled.conn
+        finally:
+            await self._release(pooled)
+
+    async def _acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        async with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        pooled = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout:.1f}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            pooled = await self._checkout(pooled)
+        except BaseException:
+            async with self._cond:
+                self._in_use -= 1
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        wait_ms = (time.monotonic() - start) * 1000
+        self._stats["acquired"] += 1
+        self._stats["wait_ms_total"] += wait_ms
+        self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+        return pooled
+
+    async def _checkout(self, pooled):
+        """Turn a pool slot into a usable connection (new, recycled or validated)"""
+        if pooled is None:
+            return await self._connect()
+
+        now = time.monotonic()
+
+        if now - pooled.created_at > self.max_lifetime:
+            await self._discard(pooled.conn)
+            self._stats["recycled"] += 1
+            return await self._connect()
+
+        if pooled.conn.is_closed() or (now - pooled.last_used > self.validate_after
+                                       and not await self._is_alive(pooled.conn)):
+            await self._discard(pooled.conn)
+            self._stats["validation_failures"] += 1
+            return await self._connect()
+
+        return pooled
+
+    async def _release(self, pooled):
+        conn = pooled.conn
+        reusable = not conn.is_closed() and not self._closed
+
+        if reusable and conn.is_in_transaction():
+            # Never hand the next caller an open or aborted transaction
+            try:
+                await conn.execute("ROLLBACK;")
+            except (asyncpg.PostgresError, OSError):
+                reusable = False
+
+        if reusable and time.monotonic() - pooled.created_at > self.max_lifetime:
+            reusable = False
+            self._stats["recycled"] += 1
+
+        async with self._cond:
+            self._in_use -= 1
+            if reusable:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+        if not reusable:
+            await self._discard(conn)
+
+    # ----------------------------------------
+    # Helpers
+    # ----------------------------------------
+
+    async def _connect(self):
+        conn = await asyncpg.connect(self.dsn)
+        if self.init is not None:
+            try:
+                await self.init(conn)
+            except BaseException:
+                await self._discard(conn)
+                raise
+        self._stats["created"] += 1
+        return _PooledConnection(conn)
+
+    @staticmethod
+    async def _is_alive(conn):
+        try:
+            await conn.fetchval("SELECT 1;")
+            return True
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError):
+            return False
+
+    @staticmethod
+    async def _discard(conn):
+        try:
+            await conn.close(timeout=5)
+        except Exception:
+            conn.terminate()
+
+    def stats(self):
+        """Snapshot of pool usage for /health"""
+        acquired = self._stats["acquired"]
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "acquired": acquired,
+            "timeouts": self._stats["timeouts"],
+            "created": self._stats["created"],
+            "recycled": self._stats["recycled"],
+            "validation_failures": self._stats["validation_failures"],
+            "wait_ms_total": round(self._stats["wait_ms_total"], 3),
+            "wait_ms_avg": round(self._stats["wait_ms_total"] / acquired, 3) if acquired else 0.0,
+            "wait_ms_max": round(self._stats["wait_ms_max"], 3),
+        }
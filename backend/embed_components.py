@@ -1,36 +1,94 @@
 """
 Phase 1: Generate embeddings for all components
-Reads components folder, creates embeddings, saves to embeddings.json
+Reads components folder, creates embeddings, saves them as a compact
+artifact (embeddings.npy + embeddings.jsonl + embeddings.meta.json, see
+embedding_store.py)
+
+Incremental: embeddings_manifest.json stores, per component, a hash of the
+searchable text (+ model identity) and of the full record. Re-runs only
+embed added/changed components, drop deleted ones and write
+embeddings_delta.json for `python upload_to_db.py --delta`. A delta that
+has not been applied yet is merged into, not overwritten; the uploader
+renames it to embeddings_delta.applied.json once it is in the database.
+Use --full to re-embed everything.
 """
 
+import argparse
+import hashlib
 import json
 import os
+import time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from embedding_store import DEFAULT_PATH, EmbeddingArtifact, artifact_exists, write_artifact
+from token_budget import count_tokens, extract_interface_view
 
-print("🚀 Starting component embedding process...")
-print("Loading embedding model (this might take 30 seconds first time)...")
+parser = argparse.ArgumentParser(description="Embed components (incrementally)")
+parser.add_argument('--full', action='store_true', help="Ignore the manifest and re-embed everything")
+parser.add_argument('--float16', action='store_true', help="Store vectors as float16 (half the size)")
+args = parser.parse_args()
 
-# Load the embedding model (384-dimensional, fast and good for code)
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-print("✅ Model loaded!\n")
+start_time = time.time()
+print("🚀 Starting component embedding process...")
 
 # Configuration
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 COMPONENTS_DIR = "./components"  #  components folder
-OUTPUT_FILE = "./embeddings.json"
+OUTPUT_PATH = DEFAULT_PATH  # embeddings.npy / .jsonl / .meta.json
+MANIFEST_FILE = "./embeddings_manifest.json"
+DELTA_FILE = "./embeddings_delta.json"
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# The model is only loaded if something actually needs embedding
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        print("Loading embedding model (this might take 30 seconds first time)...")
+        # Load the embedding model (384-dimensional, fast and good for code)
+        model = SentenceTransformer(MODEL_NAME)
+        print("✅ Model loaded!\n")
+    return model
+
+
+# Previous run: manifest + embeddings we can reuse
+manifest = {"model": MODEL_NAME, "components": {}}
+previous = None
+
+if not args.full and os.path.exists(MANIFEST_FILE) and artifact_exists(OUTPUT_PATH):
+    with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        old_manifest = json.load(f)
+    if old_manifest.get('model') == MODEL_NAME:
+        previous = EmbeddingArtifact(OUTPUT_PATH)
+        manifest['components'] = {
+            comp_id: entry for comp_id, entry in old_manifest.get('components', {}).items()
+            if comp_id in previous.row_by_id
+        }
+        print(f"📒 Manifest loaded: {len(manifest['components'])} components from last run\n")
+    else:
+        print(f"🔁 Model changed ({old_manifest.get('model')} → {MODEL_NAME}), re-embedding everything\n")
+else:
+    print("🔁 Full rebuild\n")
 
-# Storage for all embeddings
+old_entries = manifest['components']
+new_entries = {}
+
+# Storage for all records (without vectors) and their embeddings, row-aligned
+all_records = []
 all_embeddings = []
+upserted = []
+stats = {"added": 0, "changed": 0, "reembedded": 0, "unchanged": 0}
 
 # Walk through all component folders
 print(f"📁 Scanning {COMPONENTS_DIR} for components...\n")
 
-for category_folder in ['navigation', 'hero', 'footer']:
-    category_path = Path(COMPONENTS_DIR) / category_folder
-    
-    if not category_path.exists():
-        print(f"⚠️  Warning: {category_path} folder not found, skipping...")
-        continue
+for category_path in sorted(p for p in Path(COMPONENTS_DIR).iterdir() if p.is_dir()):
+    category_folder = category_path.name
     
     print(f"📂 Processing {category_folder}/ ...")
     
@@ -64,12 +122,36 @@ for category_folder in ['navigation', 'hero', 'footer']:
         Code Preview: {code[:500]}
         """.strip()
         
-        # Generate embedding (converts text to 384-dimensional vector)
-        print(f"  🔄 Embedding {metadata['id']}...")
-        embedding = model.encode(searchable_text).tolist()
+        # text_hash decides re-embedding; record_hash decides re-upload
+        text_hash = sha256(MODEL_NAME + '\n' + searchable_text)
+        record_hash = sha256(json.dumps(metadata, sort_keys=True) + '\n' + code)
+        old = old_entries.get(metadata['id'])
+        new_entries[metadata['id']] = {"text_hash": text_hash, "record_hash": record_hash}
+        
+        if old is not None and old['record_hash'] == record_hash:
+            # Nothing changed: reuse last run's record as-is
+            row = previous.row_by_id[metadata['id']]
+            all_records.append(previous.record(row))
+            all_embeddings.append(previous.matrix[row])
+            stats["unchanged"] += 1
+            continue
+        
+        if old is not None and old['text_hash'] == text_hash:
+            # Metadata/code changed outside the searchable text: keep the vector
+            embedding = previous.matrix[previous.row_by_id[metadata['id']]]
+        else:
+            # Generate embedding (converts text to 384-dimensional vector)
+            print(f"  🔄 Embedding {metadata['id']}...")
+            embedding = get_model().encode(searchable_text)
+            stats["reembedded"] += 1
+        
+        stats["changed" if old is not None else "added"] += 1
+        
+        # Precompute prompt token costs: full source vs compact interface view
+        interface_view = extract_interface_view(metadata['id'], code, metadata['props_schema'])
         
         # Store everything
-        all_embeddings.append({
+        record = {
             "id": metadata['id'],
             "filename": metadata['filename'],
             "category": metadata['category'],
@@ -81,19 +163,60 @@ for category_folder in ['navigation', 'hero', 'footer']:
             "description": metadata['description'],
             "source": metadata.get('source', 'Unknown'),
             "code": code,  # Full component code
-            "embedding": embedding  # 384-dimensional vector
-        })
+            "code_tokens": count_tokens(code),
+            "interface_view": interface_view,  # Export signature + props
+            "interface_tokens": count_tokens(interface_view)
+        }
+        all_records.append(record)
+        all_embeddings.append(embedding)  # 384-dimensional vector
+        upserted.append(dict(record, embedding=[float(x) for x in embedding]))
         
-        print(f"  ✅ {metadata['id']} embedded successfully")
+        print(f"  ✅ {metadata['id']} {'updated' if old is not None else 'added'}")
     
     print(f"  Completed {category_folder}/ ({len(json_files)} components)\n")
 
-# Save to JSON file
-print(f"💾 Saving {len(all_embeddings)} embeddings to {OUTPUT_FILE}...")
-with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    json.dump(all_embeddings, f, indent=2)
+deleted = sorted(set(old_entries) - set(new_entries))
+stats['deleted'] = len(deleted)
+
+# Save the artifact (replaces the previous one, which may still be mapped)
+dtype = 'float16' if args.float16 else 'float32'
+print(f"💾 Saving {len(all_records)} embeddings ({dtype}) to {OUTPUT_PATH}.*...")
+write_artifact(OUTPUT_PATH, all_records, all_embeddings, MODEL_NAME, dtype=dtype)
+if previous is not None:
+    previous.close()
+
+with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+    json.dump({"model": MODEL_NAME, "components": new_entries}, f, indent=2, sort_keys=True)
+
+# Delta for the uploader (applied with: python upload_to_db.py --delta).
+# Changes from earlier runs that were never uploaded are carried over;
+# this run's version of a component wins.
+pending = None
+if os.path.exists(DELTA_FILE):
+    with open(DELTA_FILE, 'r', encoding='utf-8') as f:
+        pending = json.load(f)
+    if pending.get("model") != MODEL_NAME:
+        print(f"⚠️  Discarding unapplied delta for model {pending.get('model')} (embeddings not comparable)")
+        pending = None
+if pending is not None:
+    touched = {c['id'] for c in upserted} | set(deleted)
+    carried_upserts = [c for c in pending["upserted"] if c['id'] not in touched and c['id'] in new_entries]
+    carried_deletes = [i for i in pending["deleted"] if i not in touched and i not in new_entries]
+    if carried_upserts or carried_deletes:
+        print(f"🔗 Merged unapplied delta: {len(carried_upserts)} upserts, {len(carried_deletes)} deletes carried over")
+    upserted = carried_upserts + upserted
+    deleted = sorted(set(deleted) | set(carried_deletes))
+
+with open(DELTA_FILE, 'w', encoding='utf-8') as f:
+    json.dump({"model": MODEL_NAME, "upserted": upserted, "deleted": deleted}, f)
 
-print(f"\n✅ SUCCESS! Embedded {len(all_embeddings)} components")
-print(f"📄 Output saved to: {OUTPUT_FILE}")
-print(f"📊 File size: {os.path.getsize(OUTPUT_FILE) / 1024 / 1024:.2f} MB")
-print("\n🎯 Next step: Run test_search.py to test retrieval")
\ No newline at end of file
+print(f"\n✅ SUCCESS! {len(all_records)} components in library")
+print(f"   ➕ Added: {stats['added']}")
+print(f"   ✏️  Changed: {stats['changed']} ({stats['reembedded']} embeddings computed)")
+print(f"   🗑️  Deleted: {stats['deleted']}")
+print(f"   ⏸️  Unchanged: {stats['unchanged']}")
+print(f"⏱️  Time: {time.time() - start_time:.1f}s")
+print(f"📄 Output saved to: {OUTPUT_PATH}.npy / .jsonl / .meta.json")
+print(f"📊 Artifact size: {EmbeddingArtifact(OUTPUT_PATH).file_size() / 1024 / 1024:.2f} MB")
+print(f"📦 Delta ({len(upserted)} upserts, {len(deleted)} deletes) saved to: {DELTA_FILE}")
+print("\n🎯 Next step: Run upload_to_db.py --delta to apply the changes (or test_search.py to test retrieval)")
@@ -0,0 +1,185 @@
+"""
+Phase 3: Query encoders for the API (all-MiniLM-L6-v2, 384 dims)
+Nothing heavy is imported until load(), so workers start serving health
+checks immediately and report "not ready" until warm_up() has finished.
+
+- SentenceTransformerEncoder: reference PyTorch model (torch imported lazily)
+- OnnxEncoder: the same model exported to ONNX and int8-quantized
+  (export_onnx_model.py), run by onnxruntime with the `tokenizers` library;
+  no torch, no network, loaded from a local directory
+
+Both return what SentenceTransformer.encode returns: a float32 vector for a
+string, an (n, 384) matrix for a list, L2-normalized.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_ONNX_PATH = os.path.join("models", "all-MiniLM-L6-v2-onnx-int8")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 truncates here too
+WARMUP_TEXTS = ["modern navigation with search", "dark hero section with gradient"]
+
+
+class Encoder:
+    """Lazy-loading encoder; subclasses implement _load() and _encode(list)"""
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.ready = False
+        self.load_s = None
+        self.warmup_s = None
+        self.error = None
+
+    @property
+    def cache_name(self):
+        """Embedding-cache key: vectors from different backends are not interchangeable"""
+        return f"{MODEL_NAME}@{self.name}"
+
+    def load(self):
+        """Load the model once (thread-safe; later calls return immediately)"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start = time.perf_counter()
+            try:
+                self._load()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                raise
+            self.load_s = time.perf_counter() - start
+            self._loaded = True
+
+    def warm_up(self):
+        """Load, then run a first encode so lazy kernel/graph setup is paid up front"""
+        self.load()
+        start = time.perf_counter()
+        self._encode(WARMUP_TEXTS)
+        self._encode(WARMUP_TEXTS[:1])
+        self.warmup_s = time.perf_counter() - start
+        self.ready = True
+
+    def encode(self, text):
+        """Encode a string or a list of strings (loads the model on first use)"""
+        self.load()
+        vectors = self._encode([text] if isinstance(text, str) else list(text))
+        self.ready = True  # a successful encode is as good as a warm-up
+        return vectors[0] if isinstance(text, str) else vectors
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "ready": self.ready,
+            "load_s": round(self.load_s, 3) if self.load_s is not None else None,
+            "warmup_s": round(self.warmup_s, 3) if self.warmup_s is not None else None,
+            "error": self.error,
+        }
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _encode(self, texts):
+        raise NotImplementedError
+
+
+class SentenceTransformerEncoder(Encoder):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name=MODEL_NAME):
+        super().__init__()
+        self.model_name = model_name
+        self.model = None
+
+    @property
+    def cache_name(self):
+        return self.model_name  # the reference model keeps the original cache keys
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name)
+
+    def _encode(self, texts):
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+class OnnxEncoder(Encoder):
+    """int8 ONNX graph + fast tokenizer, mean pooling and L2 normalization.
+
+    Args:
+        model_dir: Directory with model.onnx (or model_quantized.onnx) and tokenizer.json
+        threads: onnxruntime intra-op threads (0 = onnxruntime default)
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_dir=DEFAULT_ONNX_PATH, threads=0):
+        super().__init__()
+        self.model_dir = model_dir
+        self.threads = threads
+        self.session = None
+        self.tokenizer = None
+        self.input_names = None
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = None
+        for filename in ("model_quantized.onnx", "model.onnx"):
+            candidate = os.path.join(self.model_dir, filename)
+            if os.path.exists(candidate):
+                model_path = candidate
+                break
+        if model_path is None:
+            raise FileNotFoundError(
+                f"No ONNX model in {self.model_dir}; run: python export_onnx_model.py --output {self.model_dir}"
+            )
+
+        tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+        self.tokenizer = tokenizer
+        self.session = session
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then normalize (as the sentence-transformers pipeline does)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def create_encoder(backend, onnx_path=DEFAULT_ONNX_PATH, threads=0):
+    """EMBEDDING_BACKEND value -> encoder ("sentence-transformers" or "onnx")"""
+    if backend == "sentence-transformers":
+        return SentenceTransformerEncoder()
+    if backend == "onnx":
+        return OnnxEncoder(onnx_path, threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r} (expected 'sentence-transformers' or 'onnx')")
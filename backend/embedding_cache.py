@@ -0,0 +1,183 @@
+"""
+Phase 3: Two-tier cache for query embeddings
+Search and generate requests repeat the same query text a lot (health
+checks, demo prompts, "{prompt} {category}" strings), so encoding is
+skipped whenever the (model, normalized text) pair has been seen before.
+
+- Tier 1: in-process LRU with size and TTL eviction
+- Tier 2 (optional): Postgres table shared by all workers, survives restarts
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Cache key text: trimmed, lower-cased, single-spaced.
+
+    all-MiniLM-L6-v2 is an uncased model, so this does not change the
+    embedding; the normalized text is also what gets encoded.
+    """
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class LRUCache:
+    """Bounded LRU map with per-entry TTL (ttl <= 0 disables expiry)"""
+
+    def __init__(self, max_entries=10000, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """Query-embedding cache in front of an async batch encoder.
+
+    Args:
+        model_name: Embedding model identity (part of every key)
+        encode: `async def encode(texts: list) -> array of shape (n, dim)`
+        max_entries: LRU capacity
+        ttl: LRU entry lifetime in seconds
+        connection: Optional `async with connection() as conn` factory
+            enabling the persistent Postgres tier (query_embedding_cache table)
+    """
+
+    def __init__(self, model_name, encode, max_entries=10000, ttl=3600.0, connection=None):
+        self.model_name = model_name
+        self.encode = encode
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.connection = connection
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.persistent_errors = 0
+
+    async def get_many(self, texts):
+        """Return one float32 embedding per input text, encoding only misses"""
+        normalized = [normalize_query(t) for t in texts]
+        results = [None] * len(texts)
+
+        pending = {}  # normalized text -> positions still missing
+        for i, text in enumerate(normalized):
+            vector = self.memory.get((self.model_name, text))
+            if vector is not None:
+                self.memory_hits += 1
+                results[i] = vector
+            else:
+                pending.setdefault(text, []).append(i)
+
+        if pending and self.connection is not None:
+            for text, vector in (await self._load_persistent(list(pending))).items():
+                self.memory.put((self.model_name, text), vector)
+                for i in pending.pop(text):
+                    self.persistent_hits += 1
+                    results[i] = vector
+
+        if pending:
+            missing = list(pending)
+            vectors = np.asarray(await self.encode(missing), dtype=np.float32)
+            for text, vector in zip(missing, vectors):
+                self.memory.put((self.model_name, text), vector)
+                for i in pending[text]:
+                    self.misses += 1
+                    results[i] = vector
+            if self.connection is not None:
+                await self._store_persistent(missing, vectors)
+
+        return results
+
+    async def get(self, text):
+        return (await self.get_many([text]))[0]
+
+    # ----------------------------------------
+    # Persistent tier (Postgres)
+    # ----------------------------------------
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    async def _load_persistent(self, texts):
+        hashes = {self._hash(t): t for t in texts}
+        try:
+            async with self.connection() as conn:
+                rows = await conn.fetch("""
+                    SELECT query_hash, embedding
+                    FROM query_embedding_cache
+                    WHERE model = $1 AND query_hash = ANY($2::text[]);
+                """, self.model_name, list(hashes))
+        except Exception as e:
+            self.persistent_errors += 1
+            print(f"⚠️  Embedding cache read failed: {e}")
+            return {}
+
+        return {
+            hashes[row[0]]: np.asarray(row[1], dtype=np.float32)
+            for row in rows
+        }
+
+    async def _store_persistent(self, texts, vectors):
+        try:
+            async with self.connection() as conn:
+                await conn.executemany("""
+                    INSERT INTO query_embedding_cache (model, query_hash, query, embedding)
+                    VALUES ($1, $2, $3, $4::float4[])
+                    ON CONFLICT (model, query_hash) DO NOTHING;
+                """, [
+                    (self.model_name, self._hash(text), text, vector.tolist())
+                    for text, vector in zip(texts, vectors)
+                ])
+        except Exception as e:
+            self.persistent_errors += 1
+            print(f"⚠️  Embedding cache write failed: {e}")
+
+    def stats(self):
+        """Hit/miss counters for sizing the cache"""
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl_seconds": self.memory.ttl,
+            "persistent": self.connection is not None,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "persistent_errors": self.persistent_errors,
+        }
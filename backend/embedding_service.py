@@ -0,0 +1,259 @@
+"""
+Phase 3: Shared embedding service for multi-worker deployments
+One process owns the query encoder and serves every uvicorn worker on the
+node over a Unix socket, so model memory and CPU threads are paid once
+instead of once per worker. main.py uses it when EMBEDDING_SERVICE_SOCKET
+is set and falls back to in-process encoding when it is unreachable.
+
+Protocol (one request at a time per connection):
+  request:  4-byte big-endian length + JSON {"op": "encode", "texts": [...]}
+                                         or {"op": "info"}
+  response: 4-byte length + JSON header {"shape": [n, dim]} or {"error": ...}
+            (+ n * dim float32 little-endian bytes for encode)
+
+Usage: python embedding_service.py [--socket /tmp/ragsite-embeddings.sock]
+  (EMBEDDING_BACKEND / EMBEDDING_ONNX_PATH / EMBEDDING_THREADS as for main.py)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_backends import DEFAULT_ONNX_PATH, create_encoder
+from micro_batcher import MicroBatcher
+
+DEFAULT_SOCKET = "/tmp/ragsite-embeddings.sock"
+MAX_FRAME = 64 * 1024 * 1024
+_LENGTH = struct.Struct(">I")
+
+
+class EmbeddingServiceError(Exception):
+    """The service answered with an error, or the connection failed"""
+
+
+async def read_frame(reader):
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if length > MAX_FRAME:
+        raise EmbeddingServiceError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+    return await reader.readexactly(length)
+
+
+def write_frame(writer, payload):
+    writer.write(_LENGTH.pack(len(payload)) + payload)
+
+
+# ============================================
+# Client (used by main.py in every worker)
+# ============================================
+
+class EmbeddingServiceClient:
+    """Async client with a small connection pool and a failure back-off.
+
+    After a connection error the service is considered down for
+    `retry_after` seconds, so callers fall back immediately instead of
+    paying a connect timeout on every request.
+
+    Args:
+        path: Unix socket path
+        timeout: Seconds per request (connect + encode)
+        max_connections: Concurrent requests in flight to the service
+        retry_after: Seconds to skip the service after a failure
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=5.0, max_connections=4, retry_after=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = []
+        self._down_until = 0.0
+
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    async def _request(self, message):
+        if not self.available:
+            raise EmbeddingServiceError(f"Embedding service marked down ({self.last_error})")
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(
+                        asyncio.open_unix_connection(self.path), self.timeout
+                    )
+                reader, writer = connection
+                write_frame(writer, json.dumps(message).encode('utf-8'))
+                await writer.drain()
+                header = json.loads(await asyncio.wait_for(read_frame(reader), self.timeout))
+                body = None
+                if "shape" in header:
+                    n, dim = header["shape"]
+                    body = await asyncio.wait_for(reader.readexactly(n * dim * 4), self.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                if connection is not None:
+                    connection[1].close()
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._down_until = time.monotonic() + self.retry_after
+                raise EmbeddingServiceError(self.last_error) from e
+
+            self._idle.append(connection)
+
+        self.requests += 1
+        if "error" in header:
+            raise EmbeddingServiceError(header["error"])
+        return header, body
+
+    async def encode(self, texts):
+        """(len(texts), dim) float32 matrix for a list of strings"""
+        header, body = await self._request({"op": "encode", "texts": list(texts)})
+        return np.frombuffer(body, dtype='<f4').reshape(header["shape"])
+
+    async def info(self):
+        header, _ = await self._request({"op": "info"})
+        return header["info"]
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def stats(self):
+        return {
+            "socket": self.path,
+            "available": self.available,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "idle_connections": len(self._idle),
+        }
+
+
+# ============================================
+# Server
+# ============================================
+
+class EmbeddingServer:
+    """Serves encode requests from one encoder.
+
+    Encodes run on a single thread: the model already uses every core for
+    one batch, and serializing avoids workers' requests fighting over them.
+    Requests from all workers are micro-batched into shared forward passes.
+    """
+
+    def __init__(self, encoder, max_batch_size=64, max_wait_ms=2.0):
+        self.encoder = encoder
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self.batcher = MicroBatcher(self._encode, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.started_at = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.connections = 0
+
+    async def _encode(self, texts):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.encoder.encode, texts)
+
+    def info(self):
+        return {
+            "cache_name": self.encoder.cache_name,
+            "encoder": self.encoder.stats(),
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "texts": self.texts,
+            "connections": self.connections,
+            "batching": self.batcher.stats(),
+        }
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    message = json.loads(await read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+
+                if message.get("op") == "info":
+                    write_frame(writer, json.dumps({"info": self.info()}).encode('utf-8'))
+                elif message.get("op") == "encode":
+                    texts = [str(t) for t in message.get("texts", [])]
+                    try:
+                        if texts:
+                            vectors = np.ascontiguousarray(await self.batcher.submit(texts), dtype='<f4')
+                        else:
+                            vectors = np.zeros((0, 0), dtype='<f4')
+                    except Exception as e:
+                        write_frame(writer, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode('utf-8'))
+                    else:
+                        self.requests += 1
+                        self.texts += len(texts)
+                        write_frame(writer, json.dumps({"shape": list(vectors.shape)}).encode('utf-8'))
+                        writer.write(vectors.tobytes())
+                else:
+                    write_frame(writer, json.dumps({"error": f"Unknown op: {message.get('op')!r}"}).encode('utf-8'))
+                await writer.drain()
+        except (OSError, ValueError, EmbeddingServiceError) as e:
+            print(f"⚠️  Embedding service connection dropped: {e}")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+async def serve(socket_path, encoder, max_batch_size=64, max_wait_ms=2.0):
+    server = EmbeddingServer(encoder, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    print(f"Loading embedding model ({encoder.name})...")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(server.executor, encoder.warm_up)
+    stats = encoder.stats()
+    print(f"Model loaded! (load {stats['load_s']}s, warm-up {stats['warmup_s']}s)")
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # stale socket from a previous run
+    unix_server = await asyncio.start_unix_server(server.handle, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    print(f"🧠 Embedding service listening on {socket_path}")
+
+    async with unix_server:
+        await unix_server.serve_forever()
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Shared embedding service (Unix socket)")
+    parser.add_argument('--socket', default=os.getenv('EMBEDDING_SERVICE_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--backend', default=os.getenv('EMBEDDING_BACKEND', 'sentence-transformers'))
+    parser.add_argument('--onnx-path', default=os.getenv('EMBEDDING_ONNX_PATH', DEFAULT_ONNX_PATH))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('EMBEDDING_THREADS', '0')))
+    parser.add_argument('--batch-max-size', type=int, default=64)
+    parser.add_argument('--batch-max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    encoder = create_encoder(args.backend, onnx_path=args.onnx_path, threads=args.threads)
+    try:
+        asyncio.run(serve(args.socket, encoder, args.batch_max_size, args.batch_max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Phase 1: Compact on-disk embedding artifact
+Replaces the pretty-printed embeddings.json with three files sharing a base
+path (default ./embeddings):
+
+- embeddings.npy        (N, dim) float32 or float16 matrix, memory-mapped on open
+- embeddings.jsonl      one component record (metadata + code, no embedding) per line
+- embeddings.meta.json  model, dtype, shape, ids, categories and the byte offset of
+                        every sidecar line, so any row can be read on its own
+
+Opening an artifact reads only the small header; vectors are paged in by the
+OS as they are touched and records are parsed only when asked for.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+DEFAULT_PATH = "./embeddings"
+
+
+def artifact_paths(base):
+    return {
+        "matrix": f"{base}.npy",
+        "records": f"{base}.jsonl",
+        "meta": f"{base}.meta.json",
+    }
+
+
+def artifact_exists(base=DEFAULT_PATH):
+    return all(os.path.exists(p) for p in artifact_paths(base).values())
+
+
+def write_artifact(base, records, embeddings, model_name, dtype="float32"):
+    """Write records (dicts without 'embedding') and their vectors.
+
+    Files are written next to the target and renamed into place, so an
+    artifact that is currently memory-mapped can be rebuilt from itself.
+    """
+    paths = artifact_paths(base)
+    matrix = np.asarray(embeddings, dtype=dtype)
+    if matrix.size == 0:
+        matrix = matrix.reshape(0, 0)
+
+    offsets = []
+    with open(paths["records"] + ".tmp", 'wb') as f:
+        for record in records:
+            offsets.append(f.tell())
+            f.write(json.dumps(record).encode('utf-8') + b'\n')
+        offsets.append(f.tell())
+
+    with open(paths["matrix"] + ".tmp", 'wb') as f:
+        np.save(f, matrix)
+
+    with open(paths["meta"] + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "model": model_name,
+            "dtype": str(matrix.dtype),
+            "count": int(matrix.shape[0]),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "ids": [record['id'] for record in records],
+            "categories": [record['category'] for record in records],
+            "offsets": offsets,
+        }, f)
+
+    for key in ("matrix", "records", "meta"):
+        os.replace(paths[key] + ".tmp", paths[key])
+
+
+class EmbeddingArtifact:
+    """Read-only, lazily loaded view of an artifact.
+
+    Args:
+        base: Base path (without extension)
+    """
+
+    def __init__(self, base=DEFAULT_PATH):
+        self.paths = artifact_paths(base)
+
+        with open(self.paths["meta"], 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding artifact version: {meta.get('format_version')}")
+
+        self.model = meta["model"]
+        self.dtype = meta["dtype"]
+        self.ids = meta["ids"]
+        self.categories = meta["categories"]
+        self._offsets = meta["offsets"]
+        self.row_by_id = {component_id: row for row, component_id in enumerate(self.ids)}
+
+        # Zero-copy: rows are read from the page cache on access
+        self.matrix = np.load(self.paths["matrix"], mmap_mode='r')
+        self._records_file = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def close(self):
+        if self._records_file is not None:
+            self._records_file.close()
+            self._records_file = None
+
+    def record(self, row):
+        """Metadata/code dict for one row (no embedding)"""
+        if self._records_file is None:
+            self._records_file = open(self.paths["records"], 'rb')
+        self._records_file.seek(self._offsets[row])
+        return json.loads(self._records_file.read(self._offsets[row + 1] - self._offsets[row]))
+
+    def records(self):
+        """All records in row order, parsed one line at a time"""
+        with open(self.paths["records"], 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def components(self):
+        """Records with 'embedding' set to the row's (memory-mapped) vector"""
+        for row, record in enumerate(self.records()):
+            record['embedding'] = self.matrix[row]
+            yield record
+
+    def file_size(self):
+        return sum(os.path.getsize(p) for p in self.paths.values())
@@ -0,0 +1,89 @@
+"""
+Phase 3: Export all-MiniLM-L6-v2 to an int8-quantized ONNX model
+One-off, offline step for EMBEDDING_BACKEND=onnx: writes model.onnx (fp32),
+model_quantized.onnx (dynamic int8 weights) and tokenizer.json to a local
+directory, which the API then loads without torch or network access.
+
+Needs torch + transformers + onnxruntime here (not on the serving host).
+Checks the quantized model against sentence-transformers before finishing.
+
+Usage: python export_onnx_model.py [--output models/all-MiniLM-L6-v2-onnx-int8]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from embedding_backends import DEFAULT_ONNX_PATH, MODEL_NAME, OnnxEncoder, SentenceTransformerEncoder
+
+CHECK_TEXTS = [
+    "modern navigation with search",
+    "Create a modern SaaS landing page for a project management tool hero",
+    "simple footer with social links",
+    "dark hero section with gradient and call to action buttons",
+]
+
+
+def export(output_dir, opset=17):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModel.from_pretrained(MODEL_NAME).eval()
+
+    sample = tokenizer(CHECK_TEXTS[:2], padding=True, return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+
+    quantized_path = os.path.join(output_dir, "model_quantized.onnx")
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+
+    # tokenizer.json is all OnnxEncoder needs (loaded with the `tokenizers` library)
+    tokenizer.save_pretrained(output_dir)
+    return fp32_path, quantized_path
+
+
+def check(output_dir):
+    """Cosine similarity of the int8 model's embeddings to the reference model's"""
+    reference = SentenceTransformerEncoder().encode(CHECK_TEXTS)
+    quantized = OnnxEncoder(output_dir).encode(CHECK_TEXTS)
+    return np.sum(reference * quantized, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all-MiniLM-L6-v2 to int8 ONNX")
+    parser.add_argument('--output', default=DEFAULT_ONNX_PATH)
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    print(f"📦 Exporting {MODEL_NAME} to {args.output}...")
+    fp32_path, quantized_path = export(args.output, args.opset)
+    print(f"✅ fp32: {os.path.getsize(fp32_path) / 1e6:.1f} MB, "
+          f"int8: {os.path.getsize(quantized_path) / 1e6:.1f} MB")
+
+    similarities = check(args.output)
+    print(f"🎯 Agreement with sentence-transformers (cosine): "
+          f"min {similarities.min():.4f}, mean {similarities.mean():.4f}")
+    if similarities.min() < 0.98:
+        print("⚠️  Quantized embeddings drift noticeably from the reference model")
+
+
+if __name__ == "__main__":
+    main()
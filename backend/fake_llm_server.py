@@ -0,0 +1,202 @@
+"""
+Phase 3: Local stand-in for the OpenAI chat completions API (load testing)
+Implements POST /v1/chat/completions, streamed and non-streamed, with
+injected latency and canned responses, so the generation pipeline can be
+driven at high concurrency without cost or rate limits.
+
+- response_format json_object -> canned intent JSON
+- anything else               -> canned TSX page, padded to --completion-tokens
+
+Latency before the first token is log-normal (--latency-ms median,
+--latency-p95-ms 95th percentile); streamed tokens then arrive at
+--tokens-per-second. --error-rate injects 429/500 responses.
+
+Usage: python fake_llm_server.py --port 8100
+Then:  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+CANNED_INTENT = {
+    "site_type": "saas_landing",
+    "required_components": ["navigation", "hero", "footer"],
+    "style_hints": {"tone": "professional", "style": "modern"},
+    "content_hints": {"focus": "load test"}
+}
+
+CANNED_PAGE = """import React from 'react';
+import Navigation from '@/components/navigation';
+import Hero from '@/components/hero';
+import Footer from '@/components/footer';
+
+export default function Page() {
+  return (
+    <main className="min-h-screen bg-white">
+      <Navigation brand="LoadTest" links={[{ label: 'Home', href: '/' }]} />
+      <Hero title="Synthetic page" subtitle="Served by fake_llm_server.py" />
+      <Footer copyright="2024 LoadTest" />
+    </main>
+  );
+}
+"""
+
+
+def approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def create_app(latency_ms=800.0, latency_p95_ms=2000.0, completion_tokens=600,
+               tokens_per_second=80.0, error_rate=0.0, seed=None):
+    """Fake chat completions app; see the module docstring for the knobs"""
+    app = FastAPI(title="Fake OpenAI-compatible LLM")
+    rng = random.Random(seed)
+    config = {
+        "latency_ms": latency_ms,
+        "latency_p95_ms": latency_p95_ms,
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": tokens_per_second,
+        "error_rate": error_rate,
+    }
+
+    # Log-normal with the requested median and p95
+    mu = math.log(max(latency_ms, 0.001))
+    sigma = math.log(max(latency_p95_ms, latency_ms) / max(latency_ms, 0.001)) / 1.645
+
+    stats = {"requests": 0, "streamed": 0, "errors": 0, "latency_s": 0.0, "completion_tokens": 0}
+
+    def completion_text(body):
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps(CANNED_INTENT)
+        target = min(completion_tokens, body.get("max_tokens") or completion_tokens)
+        text = CANNED_PAGE
+        filler = "      {/* generated content */}\n"
+        while approx_tokens(text) < target:
+            text = text.replace("    </main>", filler + "    </main>", 1)
+        return text
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        started = time.perf_counter()
+
+        await asyncio.sleep(rng.lognormvariate(mu, sigma) / 1000)
+
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            status = rng.choice([429, 500])
+            return JSONResponse(status_code=status, content={
+                "error": {"message": "Injected failure", "type": "fake_error", "code": status}
+            })
+
+        text = completion_text(body)
+        prompt_tokens = sum(approx_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+        output_tokens = approx_tokens(text)
+        stats["completion_tokens"] += output_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake-model")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            stats["latency_s"] += time.perf_counter() - started
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        stats["streamed"] += 1
+
+        def chunk(delta=None, finish_reason=None, include_usage=False):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if include_usage else [{
+                    "index": 0,
+                    "delta": delta or {},
+                    "finish_reason": finish_reason,
+                }],
+            }
+            if include_usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            # ~4 tokens per chunk, paced at tokens_per_second
+            pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+            delay = 4 / tokens_per_second if tokens_per_second > 0 else 0
+            for piece in pieces:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk({"content": piece})
+            yield chunk(finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(include_usage=True)
+            yield "data: [DONE]\n\n"
+            stats["latency_s"] += time.perf_counter() - started
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats, config=config)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help="Median time to first token")
+    parser.add_argument('--latency-p95-ms', type=float, default=2000.0)
+    parser.add_argument('--completion-tokens', type=int, default=600)
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        latency_p95_ms=args.latency_p95_ms,
+        completion_tokens=args.completion_tokens,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"🤖 Fake LLM on http://{args.host}:{args.port}/v1 "
+          f"(median {args.latency_ms:.0f}ms, p95 {args.latency_p95_ms:.0f}ms, "
+          f"{args.completion_tokens} tokens at {args.tokens_per_second:.0f}/s, "
+          f"error rate {args.error_rate:.1%})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Phase 3: Content-addressed cache for /api/generate results
+A generation is fully determined by the prompt, the exact versions of the
+components it was assembled from and the LLM parameters, so identical
+requests can skip the composition and uniqueness passes entirely.
+
+Key = sha256(normalized prompt + sorted component id@updated_at + params)
+Store = generation_cache table, LRU-evicted down to a byte budget.
+Entries are also deleted by upload_to_db.py when a component they used changes.
+"""
+
+import hashlib
+import json
+import re
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace only; case is kept since it can end up in the copy"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_cache_key(prompt: str, components, params: dict) -> str:
+    """Content address of a generation.
+
+    Args:
+        prompt: User prompt
+        components: Iterable of (component_id, updated_at) pairs used
+        params: Models, temperatures, prompt template versions, ...
+    """
+    versions = sorted(
+        f"{component_id}@{updated_at.isoformat() if hasattr(updated_at, 'isoformat') else updated_at}"
+        for component_id, updated_at in set(components)
+    )
+    payload = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "components": versions,
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """Postgres-backed generation cache with size-bounded LRU eviction.
+
+    Args:
+        connection: `async with connection() as conn` factory (the API pool)
+        max_bytes: Total stored response size kept after eviction
+    """
+
+    def __init__(self, connection, max_bytes=256 * 1024 * 1024):
+        self.connection = connection
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self.errors = 0
+
+    async def get(self, key: str):
+        """Cached response dict, or None; refreshes the entry's LRU position"""
+        try:
+            async with self.connection() as conn:
+                response = await conn.fetchval("""
+                    UPDATE generation_cache
+                    SET last_accessed_at = NOW(), hit_count = hit_count + 1
+                    WHERE cache_key = $1
+                    RETURNING response;
+                """, key)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Generation cache read failed: {e}")
+            return None
+
+        if response is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return response
+
+    async def put(self, key: str, prompt: str, component_ids, response: dict):
+        """Store a response and evict least-recently-used entries over budget"""
+        payload = json.dumps(response)
+        try:
+            async with self.connection() as conn:
+                await conn.execute("""
+                    INSERT INTO generation_cache
+                        (cache_key, prompt, component_ids, response, size_bytes)
+                    VALUES ($1, $2, $3::text[], $4::jsonb, $5)
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        response = EXCLUDED.response,
+                        size_bytes = EXCLUDED.size_bytes,
+                        created_at = NOW(),
+                        last_accessed_at = NOW();
+                """, key, normalize_prompt(prompt), sorted(set(component_ids)),
+                    response, len(payload.encode('utf-8')))
+
+                evicted = await conn.fetchval("""
+                    WITH ranked AS (
+                        SELECT cache_key,
+                               SUM(size_bytes) OVER (ORDER BY last_accessed_at DESC, cache_key)
+                                   AS running_bytes
+                        FROM generation_cache
+                    ), removed AS (
+                        DELETE FROM generation_cache
+                        WHERE cache_key IN (
+                            SELECT cache_key FROM ranked WHERE running_bytes > $1
+                        )
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM removed;
+                """, self.max_bytes)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Generation cache write failed: {e}")
+            return
+
+        self.stores += 1
+        self.evicted += evicted or 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evicted": self.evicted,
+            "errors": self.errors,
+        }
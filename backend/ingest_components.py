@@ -0,0 +1,274 @@
+"""
+Phase 2: Streaming ingest from component folders straight to PostgreSQL
+One command instead of embed_components.py + upload_to_db.py, built as three
+concurrent stages connected by bounded queues:
+
+  discover/parse  ->  batched encode  ->  bulk write (components table)
+
+Every category folder under ./components is scanned. Only a few batches are
+ever in flight, so memory stays flat regardless of library size.
+
+Usage: python ingest_components.py [--batch-size 64] [--queue-batches 4]
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+from bulk_load import ensure_columns, load_components
+from component_cache import ensure_notify_trigger
+from token_budget import count_tokens, extract_interface_view
+from vector_index import ensure_index
+
+# Load environment variables
+load_dotenv()
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+COMPONENTS_DIR = "./components"
+
+# Marks the end of a stage's output
+DONE = object()
+
+
+def searchable_text_for(metadata, code):
+    """Text that gets embedded (same layout as embed_components.py)"""
+    return f"""
+        Category: {metadata.get('category', '')}
+        Style: {' '.join(metadata.get('style_tags', []))}
+        Colors: {' '.join(metadata.get('color_scheme', []))}
+        Description: {metadata.get('description', '')}
+        Source: {metadata.get('source', '')}
+        Code Preview: {code[:500]}
+        """.strip()
+
+
+# ============================================
+# Stage 1: discover + parse
+# ============================================
+
+def discover(components_dir, out_queue, counters):
+    """Parse every <category>/<id>.json + .tsx pair, one record at a time"""
+    for category_path in sorted(p for p in Path(components_dir).iterdir() if p.is_dir()):
+        for json_file in sorted(category_path.glob("*.json")):
+            tsx_file = json_file.with_suffix('.tsx')
+            if not tsx_file.exists():
+                print(f"  ⚠️  Warning: {category_path.name}/{tsx_file.name} not found, skipping...")
+                counters["skipped"] += 1
+                continue
+
+            with open(json_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            with open(tsx_file, 'r', encoding='utf-8') as f:
+                code = f.read()
+
+            interface_view = extract_interface_view(metadata['id'], code, metadata['props_schema'])
+            out_queue.put({
+                "id": metadata['id'],
+                "filename": metadata['filename'],
+                "category": metadata['category'],
+                "style_tags": metadata['style_tags'],
+                "color_scheme": metadata['color_scheme'],
+                "complexity": metadata['complexity'],
+                "props_schema": metadata['props_schema'],
+                "dependencies": metadata['dependencies'],
+                "description": metadata['description'],
+                "source": metadata.get('source', 'Unknown'),
+                "code": code,
+                "code_tokens": count_tokens(code),
+                "interface_view": interface_view,
+                "interface_tokens": count_tokens(interface_view),
+                "searchable_text": searchable_text_for(metadata, code),
+            })
+            counters["parsed"] += 1
+
+
+# ============================================
+# Stage 2: batched encode
+# ============================================
+
+def encode(in_queue, out_queue, batch_size, counters):
+    """Group records into batches and embed each batch with one encode() call"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Intra-op parallelism across every core for the matrix multiplies
+    torch.set_num_threads(os.cpu_count() or 1)
+    model = SentenceTransformer(MODEL_NAME)
+    print(f"✅ Model loaded ({torch.get_num_threads()} threads)\n")
+
+    def flush(batch):
+        start = time.perf_counter()
+        embeddings = model.encode(
+            [record.pop('searchable_text') for record in batch],
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        for record, embedding in zip(batch, embeddings):
+            record['embedding'] = embedding.tolist()
+        counters["encode_s"] += time.perf_counter() - start
+        counters["encoded"] += len(batch)
+        out_queue.put(batch)
+
+    batch = []
+    while True:
+        record = in_queue.get()
+        if record is DONE:
+            break
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+
+# ============================================
+# Stage 3: bulk write
+# ============================================
+
+def write(in_queue, conn, counters, started_at):
+    """Merge each batch in its own transaction and invalidate cached generations"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('generation_cache') IS NOT NULL;")
+    has_generation_cache = cursor.fetchone()[0]
+    # Older databases lack the token-count columns; API workers' component
+    # code caches are invalidated by the trigger
+    ensure_columns(cursor)
+    ensure_notify_trigger(cursor)
+    conn.commit()
+
+    while True:
+        batch = in_queue.get()
+        if batch is DONE:
+            break
+
+        start = time.perf_counter()
+        inserted_ids, updated_ids, unchanged = load_components(cursor, batch)
+        changed_ids = inserted_ids + updated_ids
+        counters["inserted"] += len(inserted_ids)
+        counters["updated"] += len(updated_ids)
+        counters["unchanged"] += unchanged
+
+        if has_generation_cache and changed_ids:
+            cursor.execute(
+                "DELETE FROM generation_cache WHERE component_ids && %s::text[];",
+                (changed_ids,)
+            )
+            counters["invalidated"] += cursor.rowcount
+
+        conn.commit()
+        counters["write_s"] += time.perf_counter() - start
+        counters["written"] += len(batch)
+
+        elapsed = time.perf_counter() - started_at
+        print(f"  💾 {counters['written']} written "
+              f"({counters['written'] / elapsed:.1f} components/s)")
+
+    cursor.close()
+
+
+def run_stage(target, downstream, errors, *args):
+    """Run a stage in its thread; always signal downstream so nothing hangs"""
+    try:
+        target(*args)
+    except Exception as e:
+        errors.append((target.__name__, e))
+    finally:
+        if downstream is not None:
+            downstream.put(DONE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming component ingest")
+    parser.add_argument('--components-dir', default=COMPONENTS_DIR)
+    parser.add_argument('--batch-size', type=int, default=64, help="Components per encode()/COPY batch")
+    parser.add_argument('--queue-batches', type=int, default=4, help="Batches buffered between stages")
+    args = parser.parse_args()
+
+    print("🚀 Streaming Component Ingest")
+    print("=" * 80 + "\n")
+
+    DATABASE_URL = os.getenv('DATABASE_URL')
+    if not DATABASE_URL:
+        print("❌ ERROR: DATABASE_URL not found in .env file")
+        exit(1)
+
+    print("📡 Connecting to database...")
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        print("✅ Connected!\n")
+    except Exception as e:
+        print(f"❌ Connection failed: {e}")
+        exit(1)
+
+    # Bounded queues are what keep memory flat: a fast stage blocks on put()
+    parsed = queue.Queue(maxsize=args.batch_size * args.queue_batches)
+    encoded = queue.Queue(maxsize=args.queue_batches)
+    counters = {
+        "parsed": 0, "skipped": 0, "encoded": 0, "written": 0, "invalidated": 0,
+        "inserted": 0, "updated": 0, "unchanged": 0,
+        "encode_s": 0.0, "write_s": 0.0,
+    }
+    errors = []
+
+    print(f"📁 Scanning {args.components_dir} (batch size {args.batch_size})...\n")
+    started_at = time.perf_counter()
+
+    stages = [
+        threading.Thread(
+            target=run_stage, name="discover", daemon=True,
+            args=(discover, parsed, errors, args.components_dir, parsed, counters)
+        ),
+        threading.Thread(
+            target=run_stage, name="encode", daemon=True,
+            args=(encode, encoded, errors, parsed, encoded, args.batch_size, counters)
+        ),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # The writer runs on the main thread
+    run_stage(write, None, errors, encoded, conn, counters, started_at)
+    if errors:
+        conn.rollback()
+        conn.close()
+        for stage_name, e in errors:
+            print(f"❌ {stage_name} stage failed: {e}")
+        exit(1)
+
+    for stage in stages:
+        stage.join()
+    elapsed = time.perf_counter() - started_at
+
+    # Resize/rebuild the ANN index if the table outgrew it (runs concurrently)
+    try:
+        index_action, index_plan, _ = ensure_index(conn)
+        print(f"\n📐 Vector index {index_action}: {index_plan['method']} "
+              f"{json.dumps(index_plan.get('params', {}))}")
+    except Exception as e:
+        print(f"\n⚠️  Vector index rebuild failed (run vector_index.py manually): {e}")
+    conn.close()
+
+    print("\n" + "=" * 80)
+    print(f"🎉 SUCCESS! Ingested {counters['written']} components")
+    print("=" * 80)
+    print("\n📊 Summary:")
+    print(f"   • Parsed: {counters['parsed']} ({counters['skipped']} skipped)")
+    print(f"   • Inserted / updated / unchanged: "
+          f"{counters['inserted']} / {counters['updated']} / {counters['unchanged']}")
+    print(f"   • Encode time: {counters['encode_s']:.1f}s")
+    print(f"   • Write time: {counters['write_s']:.1f}s")
+    print(f"   • Cached generations invalidated: {counters['invalidated']}")
+    print(f"   • Total time: {elapsed:.1f}s")
+    print(f"   • Throughput: {counters['written'] / elapsed if elapsed else 0:.1f} components/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Phase 3: Semantic cache for the intent-parsing LLM call
+Most prompts map to a handful of site_type / required_components shapes,
+so the intent of the nearest previously parsed prompt is reused when its
+embedding is similar enough, skipping the gpt-4o-mini round trip.
+"""
+
+import copy
+
+import numpy as np
+
+
+# Upper bounds of the similarity histogram buckets (best match per lookup)
+SIMILARITY_BUCKETS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0]
+
+
+class SemanticIntentCache:
+    """Nearest-neighbour lookup over embeddings of already-parsed prompts.
+
+    Entries live in a fixed-size ring buffer (oldest overwritten first), so
+    a lookup is one matrix-vector product over at most `max_entries` rows.
+
+    Args:
+        threshold: Minimum cosine similarity to reuse a cached intent
+        max_entries: Ring buffer capacity
+        dim: Embedding dimension
+    """
+
+    def __init__(self, threshold=0.92, max_entries=5000, dim=384):
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self._prompts = [None] * max_entries
+        self._intents = [None] * max_entries
+        self._count = 0
+        self._next = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.similarity_histogram = [0] * len(SIMILARITY_BUCKETS)
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, embedding):
+        """Return (intent, similarity, matched_prompt); intent is None on a miss"""
+        if self._count == 0:
+            self.misses += 1
+            return None, 0.0, None
+
+        scores = self._matrix[:self._count] @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+
+        for i, upper in enumerate(SIMILARITY_BUCKETS):
+            if similarity <= upper or i == len(SIMILARITY_BUCKETS) - 1:
+                self.similarity_histogram[i] += 1
+                break
+
+        if similarity < self.threshold:
+            self.misses += 1
+            return None, similarity, self._prompts[best]
+
+        self.hits += 1
+        return copy.deepcopy(self._intents[best]), similarity, self._prompts[best]
+
+    def store(self, prompt, embedding, intent):
+        slot = self._next
+        self._matrix[slot] = self._normalize(embedding)
+        self._prompts[slot] = prompt
+        self._intents[slot] = intent
+        self._next = (slot + 1) % self.max_entries
+        self._count = min(self._count + 1, self.max_entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "threshold": self.threshold,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "similarity_histogram": {
+                f"<={upper}": count
+                for upper, count in zip(SIMILARITY_BUCKETS, self.similarity_histogram)
+            },
+        }
@@ -0,0 +1,321 @@
+"""
+Phase 3: End-to-end load test for the API against a fake LLM
+Starts fake_llm_server.py and the FastAPI app (main.py pointed at it through
+OPENAI_BASE_URL), then drives /api/search and /api/generate at a fixed
+concurrency and reports throughput, latency percentiles and error rates per
+endpoint. With the LLM latency known, the difference is the server's own
+overhead, and sweeping --concurrency shows where throughput stops scaling.
+
+Needs DATABASE_URL (components loaded) like main.py; no OpenAI key is used.
+Prompts carry a per-request suffix and use_cache=false, so the generation
+cache does not short-circuit the pipeline. The suffixed prompts are still
+near-duplicates for the semantic intent cache, so the API is started with
+INTENT_CACHE=0 as well (--use-cache to allow both). The OpenAI client's own
+retries are turned off (OPENAI_MAX_RETRIES=0), so faults injected by the fake
+server show up in the error rates instead of as hidden extra latency. A
+--target server must be started that way by hand.
+
+Usage: python load_test.py --concurrency 1,8,32 --duration 30
+       python load_test.py --target http://localhost:8000   (already running)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+RESULT_FORMAT_VERSION = 1
+
+SEARCH_QUERIES = [
+    ("modern navigation with search", "navigation"),
+    ("dark hero section with gradient", "hero"),
+    ("simple footer with social links", "footer"),
+    ("dropdown menu navbar", "navigation"),
+    ("hero with newsletter signup", "hero"),
+    ("corporate footer with columns", "footer"),
+    ("responsive landing page header", None),
+]
+
+GENERATE_PROMPTS = [
+    "Create a modern SaaS landing page for a project management tool",
+    "Build a portfolio site for a freelance photographer",
+    "Landing page for a fintech startup with a dark theme",
+    "Minimal blog homepage for a travel writer",
+    "Ecommerce storefront for handmade ceramics",
+]
+
+
+# ============================================
+# Servers
+# ============================================
+
+def start_process(args, env=None):
+    return subprocess.Popen(
+        [sys.executable] + args,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_until_ready(url, process, timeout):
+    """Poll `url` until it answers 200; fail early if the process exited"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Server process exited with code {process.returncode} ({url})")
+            try:
+                response = await client.get(url, timeout=2)
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def stop_process(process):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ============================================
+# Load generation
+# ============================================
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles and error breakdown for one endpoint"""
+    ok = [latency for latency, status in samples if status == 200]
+    errors = {}
+    for _, status in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    total = len(samples)
+    return {
+        "requests": total,
+        "ok": len(ok),
+        "error_rate": round((total - len(ok)) / total, 4) if total else 0.0,
+        "errors": errors,
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(float(np.mean(ok)), 2) if ok else 0.0,
+            "p50": round(percentile(ok, 50), 2),
+            "p95": round(percentile(ok, 95), 2),
+            "p99": round(percentile(ok, 99), 2),
+            "max": round(max(ok), 2) if ok else 0.0,
+        },
+    }
+
+
+async def run_load(base_url, concurrency, duration, generate_fraction, mode, use_cache, timeout):
+    """`concurrency` closed-loop workers for `duration` seconds.
+
+    Each worker picks /api/generate with probability `generate_fraction`,
+    /api/search otherwise, and sends the next request when the last returns.
+    Failed requests are recorded under their HTTP status, or "timeout" /
+    "connection" for transport errors.
+    """
+    samples = {"search": [], "generate": []}
+    counter = 0
+    rng = np.random.default_rng(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                if rng.random() < generate_fraction:
+                    endpoint = "generate"
+                    prompt = GENERATE_PROMPTS[counter % len(GENERATE_PROMPTS)]
+                    payload = {
+                        "prompt": prompt if use_cache else f"{prompt} (load test #{counter})",
+                        "use_cache": use_cache,
+                        "mode": mode
+                    }
+                else:
+                    endpoint = "search"
+                    query, category = SEARCH_QUERIES[counter % len(SEARCH_QUERIES)]
+                    payload = {
+                        "query": query if use_cache else f"{query} {counter}",
+                        "category": category,
+                        "limit": 5
+                    }
+
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"/api/{endpoint}", json=payload)
+                    status = response.status_code
+                except httpx.TimeoutException:
+                    status = "timeout"
+                except httpx.TransportError:
+                    status = "connection"
+                samples[endpoint].append(((time.perf_counter() - start) * 1000, status))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": {name: summarize(s, elapsed) for name, s in samples.items() if s},
+    }
+
+
+async def fetch_json(url):
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, timeout=5)
+            return response.json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+# ============================================
+# Main
+# ============================================
+
+def print_row(concurrency, endpoint, metrics):
+    latency = metrics["latency_ms"]
+    print(f"   c={concurrency:<4} {endpoint:9} {metrics['throughput_rps']:8.2f} req/s | "
+          f"p50 {latency['p50']:8.1f}ms  p95 {latency['p95']:8.1f}ms  p99 {latency['p99']:8.1f}ms | "
+          f"errors {metrics['error_rate']:.1%} {metrics['errors'] or ''}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="End-to-end API load test with a fake LLM")
+    parser.add_argument('--target', default=None, help="Existing API base URL (skip starting servers)")
+    parser.add_argument('--api-port', type=int, default=8001)
+    parser.add_argument('--llm-port', type=int, default=8100)
+    parser.add_argument('--concurrency', default="1,4,16", help="Comma-separated levels to sweep")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Unrecorded seconds before each level")
+    parser.add_argument('--generate-fraction', type=float, default=0.2, help="Share of requests to /api/generate")
+    parser.add_argument('--mode', default="standard", choices=["fast", "standard", "quality"])
+    parser.add_argument('--use-cache', action='store_true', help="Repeat prompts and allow cache hits")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Per-request timeout (s)")
+    # Fake LLM knobs (passed through to fake_llm_server.py)
+    parser.add_argument('--llm-latency-ms', type=float, default=800.0)
+    parser.add_argument('--llm-latency-p95-ms', type=float, default=2000.0)
+    parser.add_argument('--llm-completion-tokens', type=int, default=600)
+    parser.add_argument('--llm-tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--output', default=None, help="Result JSON path")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    print("🏋️  API Load Test")
+    print("=" * 80 + "\n")
+
+    llm_process = api_process = None
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    base_url = args.target
+    try:
+        if base_url is None:
+            print(f"🤖 Starting fake LLM on {llm_url}...")
+            llm_process = start_process([
+                "fake_llm_server.py", "--port", str(args.llm_port),
+                "--latency-ms", str(args.llm_latency_ms),
+                "--latency-p95-ms", str(args.llm_latency_p95_ms),
+                "--completion-tokens", str(args.llm_completion_tokens),
+                "--tokens-per-second", str(args.llm_tokens_per_second),
+                "--error-rate", str(args.llm_error_rate),
+                "--seed", "0"
+            ])
+            await wait_until_ready(f"{llm_url}/stats", llm_process, args.startup_timeout)
+
+            base_url = f"http://127.0.0.1:{args.api_port}"
+            print(f"🚀 Starting API on {base_url} (loading embedding model)...")
+            env = dict(os.environ, OPENAI_BASE_URL=f"{llm_url}/v1", OPENAI_API_KEY="fake",
+                       OPENAI_MAX_RETRIES="0")
+            if not args.use_cache:
+                env["INTENT_CACHE"] = "0"  # "{prompt} (load test #N)" would hit it
+            api_process = start_process([
+                "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning"
+            ], env=env)
+            await wait_until_ready(f"{base_url}/ready", api_process, args.startup_timeout)
+            print("✅ Servers ready\n")
+
+        health = await fetch_json(f"{base_url}/health")
+        if health and health.get("database") != "connected":
+            print("⚠️  API reports the database as disconnected; requests will fail\n")
+        if health and health.get("intent_cache") and not args.use_cache:
+            print("⚠️  Intent cache is enabled on the target (INTENT_CACHE=0 to disable); "
+                  "most intent LLM calls will be skipped\n")
+
+        report = {
+            "format_version": RESULT_FORMAT_VERSION,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "target": args.target, "concurrency": levels, "duration_s": args.duration,
+                "generate_fraction": args.generate_fraction, "mode": args.mode,
+                "use_cache": args.use_cache,
+                "fake_llm": None if args.target else {
+                    "latency_ms": args.llm_latency_ms,
+                    "latency_p95_ms": args.llm_latency_p95_ms,
+                    "completion_tokens": args.llm_completion_tokens,
+                    "tokens_per_second": args.llm_tokens_per_second,
+                    "error_rate": args.llm_error_rate,
+                },
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+            },
+            "runs": [],
+        }
+
+        print("📊 Results:")
+        for concurrency in levels:
+            if args.warmup > 0:
+                await run_load(base_url, concurrency, args.warmup, args.generate_fraction,
+                               args.mode, args.use_cache, args.timeout)
+            run = await run_load(base_url, concurrency, args.duration, args.generate_fraction,
+                                 args.mode, args.use_cache, args.timeout)
+            report["runs"].append(run)
+            for endpoint, metrics in run["endpoints"].items():
+                print_row(concurrency, endpoint, metrics)
+
+        report["server_health"] = await fetch_json(f"{base_url}/health")
+        if llm_process is not None:
+            report["fake_llm_stats"] = await fetch_json(f"{llm_url}/stats")
+    finally:
+        stop_process(api_process)
+        stop_process(llm_process)
+
+    output = args.output or os.path.join(
+        "benchmark_results",
+        f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,27 +2,98 @@
 Phase 3: FastAPI Backend for RAG Website Generator (FIXED + RAG PROOF LOGGING)
 Endpoints:
 - POST /api/search - Test component retrieval
+- POST /api/search/batch - Many searches in one call (one encode batch, set-based SQL)
 - POST /api/generate - Full generation pipeline
+- POST /api/generate/stream - Same pipeline, streamed as server-sent events
+- GET /metrics - Prometheus metrics (per-stage latency, tokens, caches, pool)
+- GET /debug/traces - Slowest recent requests with their spans
+- GET /ready - 200 once the embedding model (or embedding service) is ready, 503 before
 """
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List
-import psycopg2
-from sentence_transformers import SentenceTransformer
-import openai
+from typing import Optional, List, Literal
+from openai import AsyncOpenAI
 import os
 from dotenv import load_dotenv
 import json
 import re
+import hashlib
+import asyncio
+import time
+import uuid
 from datetime import datetime
+from contextlib import asynccontextmanager
+
+from db_pool import ConnectionPool
+from embedding_backends import DEFAULT_ONNX_PATH, create_encoder
+from embedding_service import EmbeddingServiceClient, EmbeddingServiceError
+from micro_batcher import MicroBatcher
+from embedding_cache import EmbeddingCache
+from component_cache import ComponentCodeCache
+from search_backends import PgvectorBackend, InMemoryBackend
+from generation_cache import GenerationCache, make_cache_key
+from intent_cache import SemanticIntentCache
+from token_budget import count_tokens, extract_interface_view, fit_to_budget
+import metrics
+import tracing
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the connection pool (and in-memory index) on startup, close on shutdown"""
+    try:
+        await db_pool.open()
+        print(f"Database pool ready ({db_pool.min_size}-{db_pool.max_size} connections)")
+    except Exception as e:
+        # Keep serving; /health reports the database as disconnected
+        print(f"⚠️  Could not pre-open database connections: {e}")
+
+    # Model load + first encode; /ready answers 503 until it is done
+    warmup = None
+    if EMBEDDING_WARMUP == 'startup':
+        await warm_up_encoder()
+    elif EMBEDDING_WARMUP == 'background':
+        warmup = asyncio.create_task(warm_up_encoder())
+
+    code_listener = None
+    if component_cache is not None and component_cache.dsn:
+        code_listener = asyncio.create_task(component_cache.run_listener())
+
+    refresher = None
+    if isinstance(search_backend, InMemoryBackend):
+        try:
+            await search_backend.load()
+        except Exception as e:
+            print(f"⚠️  Could not load in-memory index (will retry): {e}")
+        refresher = asyncio.create_task(search_backend.run_refresher())
+    elif isinstance(search_backend, PgvectorBackend):
+        try:
+            await search_backend.load_index_info()
+            print(f"Vector index: {search_backend.index_info['method']} {search_backend.search_settings(limit=1)}")
+        except Exception as e:
+            print(f"⚠️  Could not read vector index info (will retry): {e}")
+
+    yield
+
+    if refresher is not None:
+        refresher.cancel()
+    if code_listener is not None:
+        code_listener.cancel()
+    if warmup is not None:
+        warmup.cancel()
+    if embedding_service is not None:
+        await embedding_service.close()
+    await db_pool.close()
+    tracer.close()
+
 # Initialize FastAPI app
-app = FastAPI(title="RAG Website Generator API", version="1.0")
+app = FastAPI(title="RAG Website Generator API", version="1.0", lifespan=lifespan)
 
 # Enable CORS for frontend access
 app.add_middleware(
@@ -33,18 +104,213 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize models and connections
-print("Loading embedding model...")
-embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-print("Model loaded!")
+# Query encoder: "sentence-transformers" (PyTorch) or "onnx" (int8 graph from
+# export_onnx_model.py, no torch). Nothing is loaded at import time.
+embedding_encoder = create_encoder(
+    os.getenv('EMBEDDING_BACKEND', 'sentence-transformers'),
+    onnx_path=os.getenv('EMBEDDING_ONNX_PATH', DEFAULT_ONNX_PATH),
+    threads=int(os.getenv('EMBEDDING_THREADS', '0'))
+)
+# "background" (default): serve immediately, warm up off the event loop
+# "startup": finish warm-up before accepting requests; "lazy": on first encode
+EMBEDDING_WARMUP = os.getenv('EMBEDDING_WARMUP', 'background')
+if EMBEDDING_WARMUP not in ('background', 'startup', 'lazy'):
+    raise ValueError(f"Unknown EMBEDDING_WARMUP: {EMBEDDING_WARMUP!r} (expected 'background', 'startup' or 'lazy')")
+
+# Shared embedding service (embedding_service.py) on this Unix socket: one model
+# per node instead of one per worker. The in-process encoder above is then only
+# loaded if the service is unreachable (EMBEDDING_SERVICE_FALLBACK=0 disables that)
+EMBEDDING_SERVICE_SOCKET = os.getenv('EMBEDDING_SERVICE_SOCKET')
+EMBEDDING_SERVICE_FALLBACK = os.getenv('EMBEDDING_SERVICE_FALLBACK', '1') == '1'
+embedding_service = EmbeddingServiceClient(
+    EMBEDDING_SERVICE_SOCKET,
+    timeout=float(os.getenv('EMBEDDING_SERVICE_TIMEOUT', '5')),
+    max_connections=int(os.getenv('EMBEDDING_SERVICE_CONNECTIONS', '4')),
+    retry_after=float(os.getenv('EMBEDDING_SERVICE_RETRY_AFTER', '5'))
+) if EMBEDDING_SERVICE_SOCKET else None
+embedding_service_info = None
+
+async def warm_up_encoder():
+    global embedding_service_info
+    if embedding_service is not None:
+        try:
+            embedding_service_info = await embedding_service.info()
+            if embedding_service_info['cache_name'] != embedding_encoder.cache_name:
+                print(f"⚠️  Embedding service runs {embedding_service_info['cache_name']}, "
+                      f"this worker is configured for {embedding_encoder.cache_name}")
+            print(f"Using embedding service at {EMBEDDING_SERVICE_SOCKET} (pid {embedding_service_info['pid']})")
+            return
+        except EmbeddingServiceError as e:
+            print(f"⚠️  Embedding service unavailable ({e})"
+                  + (", loading the model in-process" if EMBEDDING_SERVICE_FALLBACK else ""))
+            if not EMBEDDING_SERVICE_FALLBACK:
+                return
+    
+    print(f"Loading embedding model ({embedding_encoder.name})...")
+    try:
+        await run_in_threadpool(embedding_encoder.warm_up)
+        stats = embedding_encoder.stats()
+        print(f"Model loaded! (load {stats['load_s']}s, warm-up {stats['warmup_s']}s)")
+    except Exception as e:
+        print(f"⚠️  Could not load embedding model ({embedding_encoder.name}): {e}")
 
-# OpenAI setup
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# OpenAI setup (async client: LLM calls never hold a worker thread)
+# OPENAI_MAX_RETRIES: client-side retries of failed/rate-limited calls (SDK default 2;
+#   load_test.py sets 0 so the fake server's injected faults surface as errors)
+openai_client = AsyncOpenAI(
+    api_key=os.getenv('OPENAI_API_KEY'),
+    max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+)
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-# Database connection pool
+async def init_db_connection(conn):
+    """Decode JSONB columns (props_schema) to Python objects like psycopg2 did"""
+    await conn.set_type_codec(
+        'jsonb', schema='pg_catalog',
+        encoder=json.dumps, decoder=json.loads
+    )
+
+# Database connection pool (shared by search, code fetch and health check)
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    validate_after=float(os.getenv('DB_POOL_VALIDATE_AFTER', '5')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    init=init_db_connection
+)
+
 def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+    """Borrow a pooled connection: `async with get_db_connection() as conn: ...`"""
+    return db_pool.connection()
+
+async def encode_batch(texts):
+    """One forward pass for a list of texts: embedding service, or in-process off the event loop"""
+    with tracer.span("embedding.forward", texts=len(texts)) as span:
+        if embedding_service is not None:
+            try:
+                vectors = await embedding_service.encode(texts)
+                span.set(source="service")
+                return vectors
+            except EmbeddingServiceError as e:
+                if not EMBEDDING_SERVICE_FALLBACK:
+                    raise
+                span.set(service_error=str(e))
+        span.set(source="local")
+        return await run_in_threadpool(embedding_encoder.encode, texts)
+
+# Concurrent encodes are coalesced into batched forward passes (EMBEDDING_BATCHING=0 disables)
+embedding_batcher = MicroBatcher(
+    encode_batch,
+    max_batch_size=int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32')),
+    max_wait_ms=float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5')),
+    on_batch=metrics.record_embedding_batch
+) if os.getenv('EMBEDDING_BATCHING', '1') == '1' else None
+
+async def encode_text(text):
+    """Encode a string or a list of strings (micro-batched with concurrent requests)"""
+    texts = [text] if isinstance(text, str) else list(text)
+    with metrics.stage_timer("embedding_encode"), \
+            tracer.span("embedding.encode", texts=len(texts), batched=embedding_batcher is not None):
+        if embedding_batcher is not None:
+            vectors = await embedding_batcher.submit(texts)
+        else:
+            vectors = await encode_batch(texts)
+    return vectors[0] if isinstance(text, str) else vectors
+
+def embedding_ready():
+    """Local model warmed up, or the shared service answered.
+
+    Lazy warm-up never loads anything before the first request, so the
+    worker is ready from the start (the first search pays the load).
+    """
+    if EMBEDDING_WARMUP == 'lazy' or embedding_encoder.ready:
+        return True
+    return embedding_service is not None and embedding_service_info is not None and embedding_service.available
+
+# Per-request traces: JSONL file (rotated) + recent buffer for /debug/traces.
+# TRACING=0 disables, TRACE_FILE= (empty) keeps traces in memory only
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces/traces.jsonl')
+tracer = tracing.Tracer(
+    writer=tracing.JsonlWriter(
+        TRACE_FILE,
+        max_bytes=int(os.getenv('TRACE_FILE_MAX_MB', '50')) * 1024 * 1024,
+        backups=int(os.getenv('TRACE_FILE_BACKUPS', '5'))
+    ) if TRACE_FILE and os.getenv('TRACING', '1') == '1' else None,
+    recent=int(os.getenv('TRACE_RECENT', '500')),
+    enabled=os.getenv('TRACING', '1') == '1'
+)
+
+# In-process component code cache, invalidated by the components NOTIFY trigger
+# (setup_database.py). COMPONENT_CACHE=0 disables it; COMPONENT_CACHE_LISTEN=0
+# skips the LISTEN connection: entries are then only checked against the
+# updated_at the search backend saw (for "memory", as of its last index refresh)
+component_cache = ComponentCodeCache(
+    get_db_connection,
+    dsn=DATABASE_URL if os.getenv('COMPONENT_CACHE_LISTEN', '1') == '1' else None,
+    max_bytes=int(os.getenv('COMPONENT_CACHE_MAX_MB', '64')) * 1024 * 1024,
+    tracer=tracer
+) if os.getenv('COMPONENT_CACHE', '1') == '1' else None
+
+# Search backend: "pgvector" (default) or "memory" (NumPy index, DB off the hot path)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'pgvector')
+if SEARCH_BACKEND == 'memory':
+    search_backend = InMemoryBackend(
+        get_db_connection,
+        refresh_interval=float(os.getenv('SEARCH_INDEX_REFRESH_INTERVAL', '30')),
+        code_cache=component_cache,
+        tracer=tracer
+    )
+elif SEARCH_BACKEND == 'pgvector':
+    # Unset = use the recommendation stored on the index by vector_index.py
+    search_backend = PgvectorBackend(
+        get_db_connection,
+        ef_search=int(os.getenv('SEARCH_HNSW_EF_SEARCH', '0')) or None,
+        probes=int(os.getenv('SEARCH_IVFFLAT_PROBES', '0')) or None,
+        index_refresh_interval=float(os.getenv('SEARCH_INDEX_REFRESH_INTERVAL', '30')),
+        code_cache=component_cache
+    )
+else:
+    raise ValueError(f"Unknown SEARCH_BACKEND: {SEARCH_BACKEND!r} (expected 'pgvector' or 'memory')")
+
+# Generation result cache (generation_cache table), GENERATION_CACHE=0 disables it
+generation_cache = GenerationCache(
+    get_db_connection,
+    max_bytes=int(os.getenv('GENERATION_CACHE_MAX_MB', '256')) * 1024 * 1024
+) if os.getenv('GENERATION_CACHE', '1') == '1' else None
+
+# Upper bounds for POST /api/search/batch
+SEARCH_BATCH_MAX_ITEMS = int(os.getenv('SEARCH_BATCH_MAX_ITEMS', '256'))
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '50'))
+
+# Input-token limit for the composition prompt; components fall back to their
+# interface view (export signature + props) when full source does not fit
+COMPOSITION_INPUT_TOKEN_BUDGET = int(os.getenv('COMPOSITION_INPUT_TOKEN_BUDGET', '8000'))
+
+# Semantic cache for the intent-parsing call (reuse intent of a near-identical prompt)
+intent_cache = SemanticIntentCache(
+    threshold=float(os.getenv('INTENT_CACHE_THRESHOLD', '0.92')),
+    max_entries=int(os.getenv('INTENT_CACHE_SIZE', '5000'))
+) if os.getenv('INTENT_CACHE', '1') == '1' else None
+
+# Query-embedding cache: in-process LRU, plus a shared Postgres tier if enabled
+embedding_cache = EmbeddingCache(
+    embedding_encoder.cache_name,
+    encode=encode_text,
+    max_entries=int(os.getenv('EMBEDDING_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('EMBEDDING_CACHE_TTL', '3600')),
+    connection=get_db_connection if os.getenv('EMBEDDING_CACHE_PERSISTENT', '0') == '1' else None
+)
+
+# Cache and pool counters are read from their stats() on every /metrics scrape
+metrics.register_stats_collector(
+    db_pool=db_pool,
+    embedding_cache=embedding_cache,
+    generation_cache=generation_cache,
+    intent_cache=intent_cache,
+    component_cache=component_cache
+)
 
 # ============================================
 # Request/Response Models
@@ -54,9 +320,25 @@ class SearchRequest(BaseModel):
     query: str
     category: Optional[str] = None
     limit: int = 5
+    # ANN overrides for this query (pgvector backend only)
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+
+class SearchItem(BaseModel):
+    query: str
+    category: Optional[str] = None
+    limit: int = 5
+
+class BatchSearchRequest(BaseModel):
+    items: List[SearchItem]
+    # ANN settings shared by every item (pgvector backend only)
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
 
 class GenerateRequest(BaseModel):
     prompt: str
+    use_cache: bool = True  # False = always generate a fresh variant
+    mode: Literal["fast", "standard", "quality"] = "standard"
 
 class ComponentResult(BaseModel):
     id: str
@@ -70,10 +352,28 @@ class SearchResponse(BaseModel):
     results: List[ComponentResult]
     count: int
 
+class BatchSearchItemResult(BaseModel):
+    query: str
+    results: List[ComponentResult] = []
+    count: int = 0
+    error: Optional[str] = None  # set when this item failed; the others still succeed
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchItemResult]
+    count: int
+    failed: int
+
+class StageTiming(BaseModel):
+    name: str
+    duration_ms: int
+
 class GenerateResponse(BaseModel):
     code: str
     components_used: List[str]
     generation_time_ms: int
+    cached: bool = False
+    mode: str = "standard"
+    stages: List[StageTiming] = []
 
 # ============================================
 # Helper Functions
@@ -122,87 +422,111 @@ def clean_llm_response(response_text: str) -> str:
     return response_text.strip()
 
 
-def search_components_db(query: str, category: Optional[str] = None, limit: int = 5):
-    """Search database for relevant components"""
+async def search_components_db(query: str, category: Optional[str] = None, limit: int = 5,
+                               ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """Search the component library for relevant components"""
     
-    query_embedding = embedding_model.encode(query).tolist()
+    query_embedding = await embedding_cache.get(query)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with metrics.stage_timer("vector_search"), \
+            tracer.span("db.search", backend=search_backend.name, category=category, limit=limit) as span:
+        results = await search_backend.search(
+            query_embedding, category=category, limit=limit, ef_search=ef_search, probes=probes
+        )
+        span.set(rows=len(results), top_similarity=results[0]['similarity'] if results else None)
     
-    try:
-        if category:
-            cursor.execute("""
-                SELECT id, category, description, style_tags,
-                       1 - (embedding <=> %s::vector) as similarity
-                FROM components
-                WHERE category = %s
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s;
-            """, (query_embedding, category, query_embedding, limit))
-        else:
-            cursor.execute("""
-                SELECT id, category, description, style_tags,
-                       1 - (embedding <=> %s::vector) as similarity
-                FROM components
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s;
-            """, (query_embedding, query_embedding, limit))
-        
-        results = cursor.fetchall()
-        
-        return [
-            {
-                "id": row[0],
-                "category": row[1],
-                "description": row[2],
-                "style_tags": row[3],
-                "similarity": float(row[4])
-            }
-            for row in results
-        ]
-    finally:
-        cursor.close()
-        conn.close()
+    return results
+
 
+async def search_components_many(items: List[SearchItem], ef_search: Optional[int] = None,
+                                 probes: Optional[int] = None):
+    """Resolve many searches together.
 
-def get_component_code(component_ids: List[str]):
-    """Fetch full component code from database"""
+    Valid items are encoded in one batch (through the embedding cache) and
+    searched with one set-based call to the backend. Returns, per item in
+    input order, a result list or an error message.
+    """
+    outcomes = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        if not item.query.strip():
+            outcomes[i] = "query must not be empty"
+        elif not 1 <= item.limit <= SEARCH_MAX_LIMIT:
+            outcomes[i] = f"limit must be between 1 and {SEARCH_MAX_LIMIT}"
+        else:
+            valid.append(i)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if not valid:
+        return outcomes
     
-    try:
-        cursor.execute("""
-            SELECT id, code, props_schema, description
-            FROM components
-            WHERE id = ANY(%s);
-        """, (component_ids,))
-        
-        results = cursor.fetchall()
-        
-        return [
-            {
-                "id": row[0],
-                "code": row[1],
-                "props_schema": row[2],
-                "description": row[3]
-            }
-            for row in results
-        ]
-    finally:
-        cursor.close()
-        conn.close()
+    query_embeddings = await embedding_cache.get_many([items[i].query for i in valid])
+    
+    with metrics.stage_timer("vector_search"), \
+            tracer.span("db.search_many", backend=search_backend.name, queries=len(valid)) as span:
+        try:
+            matches = await search_backend.search_many(
+                query_embeddings,
+                [items[i].category for i in valid],
+                [items[i].limit for i in valid],
+                ef_search=ef_search,
+                probes=probes
+            )
+        except Exception as e:
+            matches = [e] * len(valid)
+        span.set(
+            rows=sum(len(m) for m in matches if isinstance(m, list)),
+            failed=sum(1 for m in matches if isinstance(m, Exception))
+        )
+    
+    for i, result in zip(valid, matches):
+        outcomes[i] = str(result) if isinstance(result, Exception) else result
+    return outcomes
+
+
+async def retrieve_components_by_category(prompt: str, categories: List[str], limit: int = 1,
+                                          effort: float = 1.0):
+    """Resolve every requested category in a single round trip.
+
+    All "{prompt} {category}" queries are encoded in one batch, then the
+    search backend returns the top `limit` components per category together
+    with their code and props_schema, replacing N searches + 1 code fetch.
+    `effort` scales the ANN index's ef_search / probes (recall vs latency).
+
+    Returns one list of matches per input category, in input order.
+    """
+    if not categories:
+        return []
+
+    queries = [f"{prompt} {category}" for category in categories]
+    query_embeddings = await embedding_cache.get_many(queries)
+
+    # "vector_search" is timed inside the backend, around the ANN query only
+    with tracer.span("db.search_by_category", backend=search_backend.name,
+                     categories=list(categories), limit=limit, effort=effort) as span:
+        matches = await search_backend.search_by_category(
+            query_embeddings, list(categories), limit=limit, effort=effort
+        )
+        span.set(
+            rows=sum(len(m) for m in matches),
+            top_similarity={c: m[0]['similarity'] if m else None for c, m in zip(categories, matches)}
+        )
+    
+    return matches
+
 
 # ============================================
 # OpenAI Prompt Templates
 # ============================================
 
+# Layout: static instructions first, then component code (sorted by id), then
+# per-request content last. Providers cache prompts by exact prefix, so every
+# call shares the instruction prefix and calls that reuse the same components
+# share the component block too. Keep anything request-specific out of the
+# parts above {components_context}.
+
 INTENT_PARSER_PROMPT = """
 You are an expert at analyzing website generation requests. Extract structured intent from the user prompt.
 
-User Prompt: {user_prompt}
-
 Extract and return JSON with:
 1. site_type: category (e.g., "saas_landing", "portfolio", "ecommerce", "blog")
 2. required_components: list of component types needed (e.g., ["navigation", "hero", "footer"])
@@ -218,20 +542,17 @@ Example:
   "style_hints": {{"tone": "professional", "style": "modern"}},
   "content_hints": {{"focus": "productivity tool"}}
 }}
+
+User Prompt: {user_prompt}
 """
 
 COMPOSITION_PROMPT = """
-You are an expert React developer. Create a complete Next.js page by combining these pre-built components.
-
-User Request: {user_prompt}
-
-Available Components:
-{components_context}
+You are an expert React developer. Create a complete Next.js page by combining the pre-built components listed below.
 
 Your Task:
 1. Use components AS-IS (don't modify their code)
 2. Create a complete Next.js page with proper imports
-3. Configure props appropriately
+3. Configure props appropriately for the user request at the end
 4. Ensure Tailwind styling is consistent
 5. Add TypeScript types
 
@@ -249,15 +570,15 @@ export default function Page() {{
     </div>
   )
 }}
-"""
 
-UNIQUENESS_PROMPT = """
-You are a creative web designer. Take this functional code and make it feel unique and custom.
+Available Components:
+{components_context}
 
-Original Code:
-{initial_code}
+User Request: {user_prompt}
+"""
 
-User's Intent: {user_prompt}
+UNIQUENESS_PROMPT = """
+You are a creative web designer. Take the functional code below and make it feel unique and custom for the user's intent.
 
 Make it unique by:
 1. Rewriting copy/headings (generic → specific tone)
@@ -268,11 +589,72 @@ Make it unique by:
 CRITICAL: 
 - Only change prop values, copy, colors, spacing
 - DO NOT modify component imports or structure
-- Return ONLY the raw code, no explanations or markdown blocks
+- Return ONLY the raw code, no explanations or markdown blocks, starting directly with imports
+
+Original Code:
+{initial_code}
+
+User's Intent: {user_prompt}
+"""
+
+COMPOSE_AND_CUSTOMIZE_PROMPT = """
+You are an expert React developer and creative web designer. Create a complete Next.js page by combining the pre-built components listed below, and make it feel unique and custom in the same pass.
+
+Your Task:
+1. Use components AS-IS (don't modify their code)
+2. Create a complete Next.js page with proper imports and TypeScript types
+3. Configure props for the user request at the end:
+   - Rewrite copy/headings (generic → specific tone)
+   - Use a cohesive color palette and consistent Tailwind styling
+   - Adjust spacing for visual interest and vary prop values
+
+CRITICAL: Return ONLY the raw TypeScript code. No explanations, no markdown blocks, no commentary. Start directly with imports.
+
+Available Components:
+{components_context}
 
-Start directly with imports:
+User Request: {user_prompt}
 """
 
+# LLM settings per pipeline pass
+LLM_SETTINGS = {
+    "intent": {"model": "gpt-4o-mini", "temperature": 0.1},
+    "intent_quality": {"model": "gpt-4o", "temperature": 0.1},
+    "composition": {"model": "gpt-4o", "temperature": 0.3, "max_tokens": 4000},
+    "uniqueness": {"model": "gpt-4o", "temperature": 0.7, "max_tokens": 4000},
+    "compose_and_customize": {"model": "gpt-4o", "temperature": 0.5, "max_tokens": 4000},
+}
+
+# Pipeline modes (GenerateRequest.mode), trading quality for latency:
+#   fast:     one merged compose+customize call (about half the latency and output tokens)
+#   standard: composition pass, then uniqueness pass
+#   quality:  standard, but intent always parsed fresh by gpt-4o (no semantic cache reuse)
+PIPELINE_PASSES = {
+    "fast": ["compose_and_customize"],
+    "standard": ["composition", "uniqueness"],
+    "quality": ["composition", "uniqueness"],
+}
+
+# ANN search effort per mode, as a multiple of the index's ef_search / probes
+SEARCH_EFFORT = {
+    "fast": 0.5,
+    "standard": 1.0,
+    "quality": 2.0,
+}
+
+def generation_cache_params(mode: str):
+    """Everything besides prompt and components that shapes the output"""
+    passes = PIPELINE_PASSES[mode]
+    templates = hashlib.sha256(
+        (COMPOSITION_PROMPT + UNIQUENESS_PROMPT + COMPOSE_AND_CUSTOMIZE_PROMPT).encode('utf-8')
+    ).hexdigest()
+    return {
+        "mode": mode,
+        "llm": {name: LLM_SETTINGS[name] for name in passes},
+        "templates": templates[:16],
+        "input_token_budget": COMPOSITION_INPUT_TOKEN_BUDGET
+    }
+
 # ============================================
 # API Endpoints
 # ============================================
@@ -284,228 +666,553 @@ def root():
         "version": "1.0",
         "endpoints": {
             "search": "POST /api/search",
-            "generate": "POST /api/generate"
+            "search_batch": "POST /api/search/batch",
+            "generate": "POST /api/generate",
+            "generate_stream": "POST /api/generate/stream (server-sent events)",
+            "metrics": "GET /metrics (Prometheus)",
+            "traces": "GET /debug/traces (slowest recent requests)",
+            "ready": "GET /ready"
         }
     }
 
 @app.post("/api/search", response_model=SearchResponse)
-def search_endpoint(request: SearchRequest):
+async def search_endpoint(request: SearchRequest, response: Response):
     """Test component retrieval"""
     
-    try:
-        results = search_components_db(
-            query=request.query,
-            category=request.category,
-            limit=request.limit
-        )
+    with tracer.trace("search", query=request.query, category=request.category) as trace:
+        if trace is not None:
+            response.headers["X-Request-ID"] = trace.request_id
+        try:
+            results = await search_components_db(
+                query=request.query,
+                category=request.category,
+                limit=request.limit,
+                ef_search=request.ef_search,
+                probes=request.probes
+            )
+            
+            return SearchResponse(
+                query=request.query,
+                results=results,
+                count=len(results)
+            )
         
-        return SearchResponse(
-            query=request.query,
-            results=results,
-            count=len(results)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def search_batch_endpoint(request: BatchSearchRequest, response: Response):
+    """Many component searches in one call; results in input order, errors per item"""
+    
+    if len(request.items) > SEARCH_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {SEARCH_BATCH_MAX_ITEMS} items per batch (got {len(request.items)})"
         )
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with tracer.trace("search_batch", items=len(request.items)) as trace:
+        if trace is not None:
+            response.headers["X-Request-ID"] = trace.request_id
+        try:
+            outcomes = await search_components_many(request.items, request.ef_search, request.probes)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        results = [
+            BatchSearchItemResult(query=item.query, error=outcome)
+            if isinstance(outcome, str) else
+            BatchSearchItemResult(query=item.query, results=outcome, count=len(outcome))
+            for item, outcome in zip(request.items, outcomes)
+        ]
+        failed = sum(1 for r in results if r.error is not None)
+        if trace is not None:
+            trace.root.set(failed=failed)
+        
+        return BatchSearchResponse(results=results, count=len(results), failed=failed)
 
-@app.post("/api/generate", response_model=GenerateResponse)
-def generate_endpoint(request: GenerateRequest):
-    """Full website generation pipeline"""
+async def generation_pipeline(prompt: str, use_cache: bool = True, mode: str = "standard"):
+    """Full website generation pipeline, as a stream of progress events.
+
+    Yields (event, data) pairs: "intent", "components" (with similarity
+    scores), "composition_started", "customization_started", "token" (raw
+    final-code deltas from the last, streaming LLM call) and, last,
+    "complete" with the cleaned code and the GenerateResponse fields.
+    With use_cache, a generation-cache hit goes straight to "complete".
+    `mode` selects the LLM passes (see PIPELINE_PASSES).
+    """
     
-    import time
     start_time = time.time()
+    stages = []
     
-    try:
-        print("\n" + "="*100)
-        print(f"🚀 NEW GENERATION REQUEST - {datetime.now().strftime('%H:%M:%S')}")
-        print("="*100)
-        
-        # Step 1: Parse intent
-        print(f"\n📋 STEP 1: PARSING INTENT")
-        print(f"User Prompt: '{request.prompt}'")
-        
-        intent_response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{
-                "role": "user",
-                "content": INTENT_PARSER_PROMPT.format(user_prompt=request.prompt)
-            }],
-            response_format={"type": "json_object"},
-            temperature=0.1
-        )
-        
-        intent = json.loads(intent_response.choices[0].message.content)
-        print(f"✅ Intent parsed: {json.dumps(intent, indent=2)}")
-        print(f"🎯 Token usage (intent): Input={intent_response.usage.prompt_tokens}, Output={intent_response.usage.completion_tokens}")
-        
-        # Step 2: Retrieve components from DATABASE
-        print(f"\n🔍 STEP 2: RETRIEVING COMPONENTS FROM DATABASE (RAG)")
-        print(f"Required categories: {intent.get('required_components', ['navigation', 'hero', 'footer'])}")
-        
-        all_components = []
-        components_used = []
-        retrieval_details = []
-        
-        for category in intent.get('required_components', ['navigation', 'hero', 'footer']):
-            search_query = f"{request.prompt} {category}"
-            print(f"\n  🔎 Searching database for: '{search_query}' (category: {category})")
-            
-            results = search_components_db(
-                query=search_query,
-                category=category,
-                limit=2
+    def record_stage(name, started):
+        elapsed = time.time() - started
+        stages.append({"name": name, "duration_ms": int(elapsed * 1000)})
+        metrics.observe_stage(name, elapsed)
+    
+    print("\n" + "="*100)
+    print(f"🚀 NEW GENERATION REQUEST - {datetime.now().strftime('%H:%M:%S')} (mode: {mode}, "
+          f"request {tracer.current_request_id()})")
+    print("="*100)
+    
+    # Step 1: Parse intent
+    print(f"\n📋 STEP 1: PARSING INTENT")
+    print(f"User Prompt: '{prompt}'")
+    
+    stage_start = time.time()
+    intent = None
+    intent_input_tokens = 0
+    intent_output_tokens = 0
+    intent_cached_tokens = 0
+    intent_cost = 0.0
+    
+    # Quality mode always parses fresh with the larger model: no lookup (its
+    # hits would be thrown away and skew the hit-rate stats), but the fresh
+    # intent is still stored for the other modes
+    if intent_cache is not None:
+        prompt_embedding = await embedding_cache.get(prompt)
+    if intent_cache is not None and mode != "quality":
+        with tracer.span("intent_cache.lookup") as span:
+            intent, similarity, matched_prompt = intent_cache.lookup(prompt_embedding)
+            span.set(hit=intent is not None, similarity=round(float(similarity), 4))
+        cache_stats = intent_cache.stats()
+        if intent is not None:
+            print(f"♻️  Intent cache HIT (similarity {similarity:.3f} to '{matched_prompt}')")
+        else:
+            print(f"🔎 Intent cache miss (best similarity {similarity:.3f})")
+        print(f"   Intent cache hit rate: {cache_stats['hit_ratio']:.1%} over {cache_stats['hits'] + cache_stats['misses']} lookups")
+    
+    intent_from_cache = intent is not None
+    if intent is None:
+        intent_settings = LLM_SETTINGS['intent_quality' if mode == "quality" else 'intent']
+        with tracer.span("llm.intent", model=intent_settings['model']) as span:
+            intent_response = await openai_client.chat.completions.create(
+                messages=[{
+                    "role": "user",
+                    "content": INTENT_PARSER_PROMPT.format(user_prompt=prompt)
+                }],
+                response_format={"type": "json_object"},
+                **intent_settings
             )
             
-            if results:
-                selected = results[0]
-                all_components.append(selected['id'])
-                components_used.append(selected['id'])
-                retrieval_details.append({
-                    'category': category,
-                    'component_id': selected['id'],
-                    'similarity': selected['similarity']
-                })
-                print(f"  ✅ Retrieved: {selected['id']} (similarity: {selected['similarity']:.3f})")
-        
-        print(f"\n📦 PROOF: Retrieved {len(components_used)} PRE-BUILT components from database:")
-        for detail in retrieval_details:
-            print(f"  • {detail['component_id']} - {detail['category']} (match score: {detail['similarity']:.3f})")
-        
-        # Step 3: Fetch full component code from database
-        print(f"\n💾 STEP 3: FETCHING FULL COMPONENT CODE FROM DATABASE")
-        component_details = get_component_code(all_components)
-        
-        total_component_lines = 0
-        total_component_chars = 0
-        
-        print("\n" + "-"*100)
-        print("PROOF: These are PRE-WRITTEN components, NOT generated by LLM")
-        print("-"*100)
-        
-        for comp in component_details:
-            lines = len(comp['code'].split('\n'))
-            chars = len(comp['code'])
-            total_component_lines += lines
-            total_component_chars += chars
-            
-            print(f"\n📄 Component: {comp['id']}")
-            print(f"   Source: RETRIEVED FROM DATABASE")
-            print(f"   Code size: {lines} lines, {chars} characters")
-            print(f"   Props schema: {json.dumps(comp['props_schema'])}")
-            print(f"   First 150 chars of code:")
-            print(f"   {comp['code'][:150]}...")
-        
-        print("\n" + "-"*100)
-        print(f"📊 TOTAL PRE-WRITTEN CODE: {total_component_lines} lines, {total_component_chars:,} characters")
-        print(f"💡 These components exist in our database BEFORE LLM call")
-        print("-"*100)
+            intent = json.loads(intent_response.choices[0].message.content)
+            intent_input_tokens = intent_response.usage.prompt_tokens
+            intent_output_tokens = intent_response.usage.completion_tokens
+            intent_cached_tokens = metrics.cached_prompt_tokens(intent_response.usage)
+            span.set(prompt_tokens=intent_input_tokens, completion_tokens=intent_output_tokens,
+                     cached_tokens=intent_cached_tokens)
+        metrics.record_llm_usage(intent_settings['model'], "intent", intent_input_tokens,
+                                 intent_output_tokens, intent_cached_tokens)
+        intent_cost = metrics.estimate_cost(intent_settings['model'], intent_input_tokens,
+                                            intent_output_tokens, intent_cached_tokens)
+        if intent_cache is not None:
+            intent_cache.store(prompt, prompt_embedding, intent)
+    
+    print(f"✅ Intent parsed: {json.dumps(intent, indent=2)}")
+    print(f"🎯 Token usage (intent): Input={intent_input_tokens} (cached {intent_cached_tokens}), Output={intent_output_tokens}")
+    record_stage("intent_cache" if intent_from_cache else "intent", stage_start)
+    yield "intent", intent
+    
+    # Step 2: Retrieve components (and their code) from DATABASE
+    categories = intent.get('required_components', ['navigation', 'hero', 'footer'])
+    print(f"\n🔍 STEP 2: RETRIEVING COMPONENTS FROM DATABASE (RAG)")
+    print(f"Required categories: {categories}")
+    print(f"  🔎 Resolving {len(categories)} categories in a single query")
+    
+    stage_start = time.time()
+    matches_per_category = await retrieve_components_by_category(
+        prompt=prompt,
+        categories=categories,
+        limit=2,
+        effort=SEARCH_EFFORT[mode]
+    )
+    record_stage("retrieval", stage_start)
+    
+    components_used = []
+    component_details = []
+    retrieval_details = []
+    
+    for category, results in zip(categories, matches_per_category):
+        if results:
+            selected = results[0]
+            components_used.append(selected['id'])
+            if selected['id'] not in [comp['id'] for comp in component_details]:
+                component_details.append(selected)
+            retrieval_details.append({
+                'category': category,
+                'component_id': selected['id'],
+                'similarity': selected['similarity']
+            })
+            print(f"  ✅ Retrieved: {selected['id']} (similarity: {selected['similarity']:.3f})")
+        else:
+            print(f"  ⚠️  No component found for category: {category}")
+    
+    print(f"\n📦 PROOF: Retrieved {len(components_used)} PRE-BUILT components from database:")
+    for detail in retrieval_details:
+        print(f"  • {detail['component_id']} - {detail['category']} (match score: {detail['similarity']:.3f})")
+    yield "components", {"components": retrieval_details}
+    
+    # Step 3: Full component code came back with the retrieval query
+    print(f"\n💾 STEP 3: COMPONENT CODE (fetched in the same query as retrieval)")
+    
+    total_component_lines = 0
+    total_component_chars = 0
+    
+    print("\n" + "-"*100)
+    print("PROOF: These are PRE-WRITTEN components, NOT generated by LLM")
+    print("-"*100)
+    
+    for comp in component_details:
+        lines = len(comp['code'].split('\n'))
+        chars = len(comp['code'])
+        total_component_lines += lines
+        total_component_chars += chars
         
-        # Format for LLM
-        components_context = "\n\n".join([
-            f"### {comp['id']}\n```typescript\n{comp['code']}\n```\n"
-            for comp in component_details
-        ])
+        print(f"\n📄 Component: {comp['id']}")
+        print(f"   Source: RETRIEVED FROM DATABASE")
+        print(f"   Code size: {lines} lines, {chars} characters")
+        print(f"   Props schema: {json.dumps(comp['props_schema'])}")
+        print(f"   First 150 chars of code:")
+        print(f"   {comp['code'][:150]}...")
+    
+    print("\n" + "-"*100)
+    print(f"📊 TOTAL PRE-WRITTEN CODE: {total_component_lines} lines, {total_component_chars:,} characters")
+    print(f"💡 These components exist in our database BEFORE LLM call")
+    print("-"*100)
+    
+    # Same prompt + same component versions + same LLM settings = same page
+    cache_key = make_cache_key(
+        prompt,
+        [(comp['id'], comp['updated_at']) for comp in component_details],
+        generation_cache_params(mode)
+    )
+    if use_cache and generation_cache is not None:
+        stage_start = time.time()
+        with tracer.span("db.generation_cache.get") as span:
+            cached = await generation_cache.get(cache_key)
+            span.set(hit=cached is not None)
+        record_stage("generation_cache", stage_start)
+        if cached is not None:
+            generation_time = int((time.time() - start_time) * 1000)
+            print(f"\n♻️  GENERATION CACHE HIT - skipping composition and uniqueness passes")
+            print(f"⏱️  Time: {generation_time / 1000:.1f}s")
+            print("="*100 + "\n")
+            yield "complete", {
+                "code": cached['code'],
+                "components_used": components_used,
+                "generation_time_ms": generation_time,
+                "cached": True,
+                "mode": mode,
+                "stages": stages
+            }
+            return
+    
+    # Format for LLM: full source where the token budget allows, interface view otherwise
+    for comp in component_details:
+        if comp.get('code_tokens') is None:  # row ingested before token counts existed
+            comp['code_tokens'] = count_tokens(comp['code'])
+        if comp.get('interface_view') is None:
+            comp['interface_view'] = extract_interface_view(comp['id'], comp['code'], comp['props_schema'])
+            comp['interface_tokens'] = count_tokens(comp['interface_view'])
+    
+    template = COMPOSE_AND_CUSTOMIZE_PROMPT if mode == "fast" else COMPOSITION_PROMPT
+    context_budget = COMPOSITION_INPUT_TOKEN_BUDGET - count_tokens(template) - count_tokens(prompt)
+    # Sorted by id, not retrieval order: the same component set always renders
+    # the same context block, so it stays a cacheable prompt prefix
+    context_components = sorted(component_details, key=lambda comp: comp['id'])
+    representations, context_tokens = fit_to_budget(context_components, context_budget)
+    
+    components_context = "\n\n".join([
+        f"### {comp['id']}\n```typescript\n{comp['code'] if representation == 'full' else comp['interface_view']}\n```\n"
+        for comp, representation in zip(context_components, representations)
+    ])
+    
+    print(f"\n🧮 CONTEXT BUDGET: {context_tokens:,} / {context_budget:,} tokens for components")
+    for comp, representation in zip(context_components, representations):
+        tokens = comp['code_tokens'] if representation == 'full' else comp['interface_tokens']
+        print(f"   • {comp['id']}: {representation} ({tokens:,} tokens)")
+    if context_tokens > context_budget:
+        print(f"   ⚠️  Over budget even with interface views only")
+    
+    comp_input_tokens = 0
+    comp_output_tokens = 0
+    comp_cached_tokens = 0
+    comp_cost = 0.0
+    
+    if mode == "fast":
+        # Step 4+5: Compose and customize in a single call
+        print(f"\n⚡ STEP 4: LLM COMPOSITION + CUSTOMIZATION (single pass, fast mode)")
+        print(f"LLM task: Assemble pre-built components + configure unique props")
+        yield "composition_started", {"components_used": components_used}
         
+        final_stage = "compose_and_customize"
+        final_prompt = COMPOSE_AND_CUSTOMIZE_PROMPT.format(
+            user_prompt=prompt,
+            components_context=components_context
+        )
+    else:
         # Step 4: Compose with OpenAI (ASSEMBLY, not generation)
         print(f"\n🔧 STEP 4: LLM COMPOSITION (Assembly Only, Not Generation)")
         print(f"LLM task: Assemble pre-built components + configure props")
         print(f"LLM is NOT writing component code from scratch")
+        yield "composition_started", {"components_used": components_used}
         
-        composition_response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role": "user",
-                "content": COMPOSITION_PROMPT.format(
-                    user_prompt=request.prompt,
-                    components_context=components_context
-                )
-            }],
-            temperature=0.3,
-            max_tokens=4000
-        )
+        stage_start = time.time()
+        with tracer.span("llm.composition", model=LLM_SETTINGS['composition']['model'],
+                         context_tokens=context_tokens) as span:
+            composition_response = await openai_client.chat.completions.create(
+                messages=[{
+                    "role": "user",
+                    "content": COMPOSITION_PROMPT.format(
+                        user_prompt=prompt,
+                        components_context=components_context
+                    )
+                }],
+                **LLM_SETTINGS['composition']
+            )
+            span.set(prompt_tokens=composition_response.usage.prompt_tokens,
+                     completion_tokens=composition_response.usage.completion_tokens,
+                     cached_tokens=metrics.cached_prompt_tokens(composition_response.usage))
         
         initial_code = composition_response.choices[0].message.content
-        initial_code = clean_llm_response(initial_code)
+        with metrics.stage_timer("response_cleaning"):
+            initial_code = clean_llm_response(initial_code)
+        record_stage("composition", stage_start)
         
         comp_input_tokens = composition_response.usage.prompt_tokens
         comp_output_tokens = composition_response.usage.completion_tokens
+        comp_cached_tokens = metrics.cached_prompt_tokens(composition_response.usage)
+        metrics.record_llm_usage(LLM_SETTINGS['composition']['model'], "composition",
+                                 comp_input_tokens, comp_output_tokens, comp_cached_tokens)
         
         print(f"\n📊 COMPOSITION TOKEN BREAKDOWN:")
         print(f"   Input tokens: {comp_input_tokens}")
-        print(f"      └─ Of which ~{total_component_chars // 4} tokens are PRE-WRITTEN component code")
+        print(f"      └─ Of which {context_tokens:,} tokens are PRE-WRITTEN component code")
+        print(f"      └─ Of which {comp_cached_tokens:,} tokens were served from the prompt cache")
         print(f"   Output tokens: {comp_output_tokens}")
         print(f"      └─ LLM only wrote GLUE CODE and prop configuration")
-        print(f"\n💰 Cost: ~${(comp_input_tokens * 0.0025 + comp_output_tokens * 0.01) / 1000:.4f}")
+        comp_cost = metrics.estimate_cost(LLM_SETTINGS['composition']['model'],
+                                          comp_input_tokens, comp_output_tokens, comp_cached_tokens)
+        print(f"\n💰 Cost: ~${comp_cost:.4f}")
         
         # Step 5: Uniqueness pass
         print(f"\n🎨 STEP 5: UNIQUENESS PASS (Customization)")
+        yield "customization_started", {}
         
-        uniqueness_response = openai.chat.completions.create(
-            model="gpt-4o",
+        final_stage = "uniqueness"
+        final_prompt = UNIQUENESS_PROMPT.format(
+            initial_code=initial_code,
+            user_prompt=prompt
+        )
+    
+    # Last LLM call is streamed, so callers can show the final code as it arrives
+    stage_start = time.time()
+    final_chunks = []
+    uniqueness_usage = None
+    with tracer.span(f"llm.{final_stage}", model=LLM_SETTINGS[final_stage]['model'], stream=True) as span:
+        final_stream = await openai_client.chat.completions.create(
             messages=[{
                 "role": "user",
-                "content": UNIQUENESS_PROMPT.format(
-                    initial_code=initial_code,
-                    user_prompt=request.prompt
-                )
+                "content": final_prompt
             }],
-            temperature=0.7,
-            max_tokens=4000
+            **LLM_SETTINGS[final_stage],
+            stream=True,
+            stream_options={"include_usage": True}
         )
         
-        final_code = uniqueness_response.choices[0].message.content
-        final_code = clean_llm_response(final_code)
-        
-        unique_input_tokens = uniqueness_response.usage.prompt_tokens
-        unique_output_tokens = uniqueness_response.usage.completion_tokens
+        async for chunk in final_stream:
+            if chunk.usage is not None:
+                uniqueness_usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not final_chunks:
+                    first_token_s = time.time() - stage_start
+                    span.set(first_token_ms=int(first_token_s * 1000))
+                    metrics.observe_stage(f"{final_stage}_first_token", first_token_s)
+                final_chunks.append(chunk.choices[0].delta.content)
+                yield "token", {"text": chunk.choices[0].delta.content}
         
-        print(f"   Input tokens: {unique_input_tokens}")
-        print(f"   Output tokens: {unique_output_tokens}")
-        print(f"   Cost: ~${(unique_input_tokens * 0.0025 + unique_output_tokens * 0.01) / 1000:.4f}")
-        
-        generation_time = int((time.time() - start_time) * 1000)
-        
-        # Final summary
-        total_input_tokens = intent_response.usage.prompt_tokens + comp_input_tokens + unique_input_tokens
-        total_output_tokens = intent_response.usage.completion_tokens + comp_output_tokens + unique_output_tokens
-        total_cost = (total_input_tokens * 0.0025 + total_output_tokens * 0.01) / 1000
-        
-        print("\n" + "="*100)
-        print("✅ GENERATION COMPLETE - SUMMARY")
-        print("="*100)
-        print(f"⏱️  Time: {generation_time / 1000:.1f}s")
-        print(f"📦 Components used: {', '.join(components_used)}")
-        print(f"\n📊 TOKEN USAGE PROOF:")
-        print(f"   Total input tokens: {total_input_tokens:,}")
-        print(f"      └─ Most are PRE-WRITTEN components (~{total_component_chars // 4:,} tokens)")
-        print(f"   Total output tokens: {total_output_tokens:,}")
-        print(f"      └─ Only assembly code, NOT full component generation")
-        print(f"   Total cost: ${total_cost:.3f}")
-        print(f"\n💡 COMPARISON:")
-        print(f"   Our approach: {total_input_tokens:,} input, {total_output_tokens:,} output")
-        print(f"   v0/Lovable (estimate): 500 input, 15,000+ output (generating from scratch)")
-        print(f"   Savings: ~{((15000 - total_output_tokens) / 15000 * 100):.0f}% fewer output tokens")
-        print("="*100 + "\n")
+        if uniqueness_usage is not None:
+            span.set(prompt_tokens=uniqueness_usage.prompt_tokens,
+                     completion_tokens=uniqueness_usage.completion_tokens,
+                     cached_tokens=metrics.cached_prompt_tokens(uniqueness_usage))
+    
+    with metrics.stage_timer("response_cleaning"):
+        final_code = clean_llm_response("".join(final_chunks))
+    record_stage(final_stage, stage_start)
+    
+    unique_input_tokens = uniqueness_usage.prompt_tokens if uniqueness_usage else 0
+    unique_output_tokens = uniqueness_usage.completion_tokens if uniqueness_usage else 0
+    unique_cached_tokens = metrics.cached_prompt_tokens(uniqueness_usage)
+    metrics.record_llm_usage(LLM_SETTINGS[final_stage]['model'], final_stage,
+                             unique_input_tokens, unique_output_tokens, unique_cached_tokens)
+    
+    print(f"   Input tokens: {unique_input_tokens} (cached {unique_cached_tokens})")
+    print(f"   Output tokens: {unique_output_tokens}")
+    unique_cost = metrics.estimate_cost(LLM_SETTINGS[final_stage]['model'],
+                                        unique_input_tokens, unique_output_tokens, unique_cached_tokens)
+    print(f"   Cost: ~${unique_cost:.4f}")
+    
+    generation_time = int((time.time() - start_time) * 1000)
+    
+    # Final summary
+    total_input_tokens = intent_input_tokens + comp_input_tokens + unique_input_tokens
+    total_output_tokens = intent_output_tokens + comp_output_tokens + unique_output_tokens
+    total_cached_tokens = intent_cached_tokens + comp_cached_tokens + unique_cached_tokens
+    # Per-pass costs, each at its own model's prices
+    total_cost = intent_cost + comp_cost + unique_cost
+    
+    print("\n" + "="*100)
+    print("✅ GENERATION COMPLETE - SUMMARY")
+    print("="*100)
+    print(f"⏱️  Time: {generation_time / 1000:.1f}s")
+    stage_summary = ', '.join(f"{st['name']} {st['duration_ms'] / 1000:.1f}s" for st in stages)
+    print(f"🧭 Stages ({mode}): {stage_summary}")
+    print(f"📦 Components used: {', '.join(components_used)}")
+    print(f"\n📊 TOKEN USAGE PROOF:")
+    print(f"   Total input tokens: {total_input_tokens:,}")
+    print(f"      └─ Most are PRE-WRITTEN components ({context_tokens:,} tokens)")
+    print(f"      └─ {total_cached_tokens:,} served from the provider's prompt cache")
+    print(f"   Total output tokens: {total_output_tokens:,}")
+    print(f"      └─ Only assembly code, NOT full component generation")
+    print(f"   Total cost: ${total_cost:.3f}")
+    print(f"\n💡 COMPARISON:")
+    print(f"   Our approach: {total_input_tokens:,} input, {total_output_tokens:,} output")
+    print(f"   v0/Lovable (estimate): 500 input, 15,000+ output (generating from scratch)")
+    print(f"   Savings: ~{((15000 - total_output_tokens) / 15000 * 100):.0f}% fewer output tokens")
+    print("="*100 + "\n")
+    
+    if generation_cache is not None:
+        with tracer.span("db.generation_cache.put"):
+            await generation_cache.put(cache_key, prompt, components_used, {
+                "code": final_code,
+                "components_used": components_used
+            })
+    
+    yield "complete", {
+        "code": final_code,
+        "components_used": components_used,
+        "generation_time_ms": generation_time,
+        "cached": False,
+        "mode": mode,
+        "stages": stages
+    }
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/generate", response_model=GenerateResponse)
+async def generate_endpoint(request: GenerateRequest, response: Response):
+    """Full website generation pipeline"""
+    
+    with tracer.trace("generate", prompt=request.prompt, mode=request.mode,
+                      use_cache=request.use_cache) as trace:
+        if trace is not None:
+            response.headers["X-Request-ID"] = trace.request_id
+        try:
+            async for event, data in generation_pipeline(request.prompt, request.use_cache, request.mode):
+                if event == "complete":
+                    if trace is not None:
+                        trace.root.set(cached=data['cached'], components_used=data['components_used'])
+                    return GenerateResponse(**data)
         
-        return GenerateResponse(
-            code=final_code,
-            components_used=components_used,
-            generation_time_ms=generation_time
-        )
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/generate/stream")
+async def generate_stream_endpoint(request: GenerateRequest):
+    """Same pipeline as /api/generate, streamed as server-sent events"""
     
-    except Exception as e:
-        print(f"\n❌ ERROR: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    request_id = uuid.uuid4().hex
+    
+    async def event_stream():
+        with tracer.trace("generate_stream", request_id=request_id, prompt=request.prompt,
+                          mode=request.mode, use_cache=request.use_cache) as trace:
+            yield sse_event("started", {"prompt": request.prompt, "request_id": request_id})
+            try:
+                async for event, data in generation_pipeline(request.prompt, request.use_cache, request.mode):
+                    if event == "complete" and trace is not None:
+                        trace.root.set(cached=data['cached'], components_used=data['components_used'])
+                    yield sse_event(event, data)
+            except Exception as e:
+                print(f"\n❌ ERROR: {e}")
+                if trace is not None:
+                    trace.root.error = f"{type(e).__name__}: {e}"
+                yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-ID": request_id}
+    )
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/traces")
+async def debug_traces(limit: int = 20, name: Optional[str] = None):
+    """Slowest of the recently finished requests (name: search, search_batch, generate, generate_stream)"""
+    return {
+        "tracer": tracer.stats(),
+        "traces": tracer.slowest(limit=limit, name=name)
+    }
+
+@app.get("/debug/traces/{request_id}")
+async def debug_trace(request_id: str):
+    """One recent request by its X-Request-ID"""
+    trace = tracer.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {request_id} not found (not recent or tracing disabled)")
+    return trace
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 503 until the embedding model has been warmed up"""
+    embedding = {
+        "local": embedding_encoder.stats(),
+        "service": embedding_service.stats() if embedding_service else None
+    }
+    if embedding_ready():
+        return {"status": "ready", "embedding": embedding}
+    return JSONResponse(status_code=503, content={"status": "not ready", "embedding": embedding})
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     try:
-        conn = get_db_connection()
-        conn.close()
-        return {"status": "healthy", "database": "connected"}
-    except:
-        return {"status": "unhealthy", "database": "disconnected"}
+        async with get_db_connection() as conn:
+            await conn.fetchval("SELECT 1;")
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "pool": db_pool.stats(),
+            "embedding": embedding_encoder.stats(),
+            "embedding_service": embedding_service.stats() if embedding_service else None,
+            "embedding_batching": embedding_batcher.stats() if embedding_batcher else None,
+            "search": search_backend.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "generation_cache": generation_cache.stats() if generation_cache else None,
+            "intent_cache": intent_cache.stats() if intent_cache else None,
+            "component_cache": component_cache.stats() if component_cache else None
+        }
+    except Exception:
+        return {
+            "status": "unhealthy",
+            "database": "disconnected",
+            "pool": db_pool.stats(),
+            "embedding": embedding_encoder.stats(),
+            "embedding_service": embedding_service.stats() if embedding_service else None,
+            "embedding_batching": embedding_batcher.stats() if embedding_batcher else None,
+            "search": search_backend.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "generation_cache": generation_cache.stats() if generation_cache else None,
+            "intent_cache": intent_cache.stats() if intent_cache else None,
+            "component_cache": component_cache.stats() if component_cache else None
+        }
 
 if __name__ == "__main__":
     import uvicorn
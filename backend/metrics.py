@@ -0,0 +1,203 @@
+"""
+Phase 3: Prometheus metrics for the FastAPI backend (served on GET /metrics)
+- ragsite_stage_duration_seconds{stage}: latency histogram per pipeline stage
+- ragsite_llm_tokens_total{model,kind}: prompt / cached_prompt / completion tokens per model
+- ragsite_llm_cost_usd_total{model}: estimated spend per model
+- ragsite_embedding_batch_size / _queue_wait_seconds: query-encode micro-batching
+- cache, DB pool and search counters, read from the existing stats() of each
+  component at scrape time so nothing is counted twice
+
+Metrics are per process; run one scrape target per uvicorn worker.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# Stages range from sub-millisecond (cache lookups) to tens of seconds (LLM passes)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# USD per 1K tokens (input, cached input, output); unknown models are priced as gpt-4o.
+# Cached input = prompt prefix served from the provider's prompt cache
+MODEL_PRICES_PER_1K = {
+    "gpt-4o": (0.0025, 0.00125, 0.01),
+    "gpt-4o-mini": (0.00015, 0.000075, 0.0006),
+}
+
+STAGE_DURATION = Histogram(
+    "ragsite_stage_duration_seconds",
+    "Duration of each generation / search pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+LLM_TOKENS = Counter(
+    "ragsite_llm_tokens_total",
+    "Tokens sent to / received from the LLM",
+    ["model", "kind"]
+)
+
+LLM_COST = Counter(
+    "ragsite_llm_cost_usd_total",
+    "Estimated LLM spend in USD",
+    ["model"]
+)
+
+LLM_CALLS = Counter(
+    "ragsite_llm_calls_total",
+    "LLM calls per pipeline pass",
+    ["model", "stage"]
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "ragsite_embedding_batch_size",
+    "Texts per batched forward pass of the query encoder",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "ragsite_embedding_queue_wait_seconds",
+    "Time an encode request waited for its batch to start",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+EMBEDDING_TEXTS = Counter(
+    "ragsite_embedding_texts",
+    "Texts encoded by the query encoder (after de-duplication)"
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def observe_stage(stage, seconds):
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage):
+    """`with stage_timer("vector_search"): ...` records into the stage histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens=0):
+    """USD for one call; `cached_prompt_tokens` is the part of `prompt_tokens` read from cache"""
+    input_price, cached_price, output_price = MODEL_PRICES_PER_1K.get(model, MODEL_PRICES_PER_1K["gpt-4o"])
+    return ((prompt_tokens - cached_prompt_tokens) * input_price
+            + cached_prompt_tokens * cached_price
+            + completion_tokens * output_price) / 1000
+
+
+def cached_prompt_tokens(usage):
+    """Prompt tokens served from the provider's prompt cache (0 if not reported)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+
+def record_llm_usage(model, stage, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Count one LLM call's tokens and estimated cost"""
+    LLM_CALLS.labels(model=model, stage=stage).inc()
+    LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model=model, kind="cached_prompt").inc(cached_tokens)
+    LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+    LLM_COST.labels(model=model).inc(estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens))
+
+
+def record_embedding_batch(texts, queue_waits, encode_s):
+    """MicroBatcher on_batch observer"""
+    EMBEDDING_BATCH_SIZE.observe(texts)
+    EMBEDDING_TEXTS.inc(texts)
+    for wait in queue_waits:
+        EMBEDDING_QUEUE_WAIT.observe(wait)
+    observe_stage("embedding_batch", encode_s)
+
+
+class StatsCollector:
+    """Exposes the counters the app already keeps (stats() dicts) at scrape time.
+
+    Args:
+        db_pool: ConnectionPool
+        embedding_cache: EmbeddingCache
+        generation_cache: GenerationCache or None
+        intent_cache: SemanticIntentCache or None
+        component_cache: ComponentCodeCache or None
+    """
+
+    def __init__(self, db_pool, embedding_cache, generation_cache=None, intent_cache=None,
+                 component_cache=None):
+        self.db_pool = db_pool
+        self.embedding_cache = embedding_cache
+        self.generation_cache = generation_cache
+        self.intent_cache = intent_cache
+        self.component_cache = component_cache
+
+    def collect(self):
+        pool = self.db_pool.stats()
+        yield CounterMetricFamily(
+            "ragsite_db_pool_acquired", "Connections checked out of the pool",
+            value=pool["acquired"]
+        )
+        yield CounterMetricFamily(
+            "ragsite_db_pool_wait_seconds", "Total time spent waiting for a pooled connection",
+            value=pool["wait_ms_total"] / 1000
+        )
+        yield CounterMetricFamily(
+            "ragsite_db_pool_timeouts", "Checkouts that gave up after the pool timeout",
+            value=pool["timeouts"]
+        )
+        yield CounterMetricFamily(
+            "ragsite_db_pool_connections_created", "New database connections opened",
+            value=pool["created"]
+        )
+        for name in ("size", "idle", "in_use", "waiting", "max_size"):
+            yield GaugeMetricFamily(f"ragsite_db_pool_{name}", f"Pool {name.replace('_', ' ')}", value=pool[name])
+
+        lookups = CounterMetricFamily(
+            "ragsite_cache_lookups", "Cache lookups by cache and result", labels=["cache", "result"]
+        )
+        embedding = self.embedding_cache.stats()
+        lookups.add_metric(["embedding", "memory_hit"], embedding["memory_hits"])
+        lookups.add_metric(["embedding", "persistent_hit"], embedding["persistent_hits"])
+        lookups.add_metric(["embedding", "miss"], embedding["misses"])
+        for name, cache in (("generation", self.generation_cache), ("intent", self.intent_cache),
+                            ("component_code", self.component_cache)):
+            if cache is not None:
+                stats = cache.stats()
+                lookups.add_metric([name, "hit"], stats["hits"])
+                lookups.add_metric([name, "miss"], stats["misses"])
+        yield lookups
+
+        yield GaugeMetricFamily(
+            "ragsite_embedding_cache_entries", "Query embeddings held in memory",
+            value=embedding["entries"]
+        )
+        if self.intent_cache is not None:
+            yield GaugeMetricFamily(
+                "ragsite_intent_cache_entries", "Parsed intents held by the semantic cache",
+                value=self.intent_cache.stats()["entries"]
+            )
+        if self.component_cache is not None:
+            component = self.component_cache.stats()
+            yield GaugeMetricFamily(
+                "ragsite_component_cache_bytes", "Estimated size of cached component code",
+                value=component["bytes"]
+            )
+            yield CounterMetricFamily(
+                "ragsite_component_cache_invalidations", "Component code entries dropped by NOTIFY",
+                value=component["invalidations"]
+            )
+
+
+def register_stats_collector(**components):
+    REGISTRY.register(StatsCollector(**components))
+
+
+def render():
+    """Body for GET /metrics"""
+    return generate_latest(REGISTRY)
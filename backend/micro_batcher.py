@@ -0,0 +1,133 @@
+"""
+Phase 3: Micro-batching for query encodes
+Concurrent requests each encode one or a few short queries; a batch-size-1
+forward pass wastes most of what the CPU could do. The batcher collects
+encode calls for up to `max_wait_ms` (or until `max_batch_size` texts are
+waiting), runs one batched forward pass and hands every caller its rows.
+
+Only one batch is in flight at a time, so requests arriving while the model
+is busy naturally form the next, larger batch. Used in front of the model
+by main.py and by embedding_service.py.
+"""
+
+import asyncio
+import contextvars
+import time
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesces concurrent `await submit(texts)` calls into batched encodes.
+
+    Args:
+        encode: `async def encode(texts: list) -> array of shape (n, dim)`
+        max_batch_size: Texts per forward pass (a single larger call still runs alone)
+        max_wait_ms: How long the first waiting call may be held to fill a batch
+        on_batch: Optional `on_batch(texts, queue_waits_s, encode_s)` observer
+    """
+
+    def __init__(self, encode, max_batch_size=32, max_wait_ms=5.0, on_batch=None):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.on_batch = on_batch
+
+        self._pending = []       # (texts, future, enqueued_at)
+        self._pending_texts = 0
+        self._full = asyncio.Event()
+        self._worker = None
+
+        self.requests = 0
+        self.completed = 0
+        self.batches = 0
+        self.texts = 0
+        self.deduplicated = 0
+        self.max_batch = 0
+        self.queue_wait_s_total = 0.0
+        self.queue_wait_s_max = 0.0
+        self.encode_s_total = 0.0
+
+    async def submit(self, texts):
+        """Encode `texts` as part of a shared batch; returns (len(texts), dim)"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((list(texts), future, time.perf_counter()))
+        self._pending_texts += len(texts)
+        self.requests += 1
+
+        if self._pending_texts >= self.max_batch_size:
+            self._full.set()
+        if self._worker is None or self._worker.done():
+            # Fresh context: the worker must not inherit the first caller's trace
+            self._worker = asyncio.get_running_loop().create_task(
+                self._run(), context=contextvars.Context()
+            )
+        return await future
+
+    def _take_batch(self):
+        batch, count = [], 0
+        while self._pending and (not batch or count + len(self._pending[0][0]) <= self.max_batch_size):
+            item = self._pending.pop(0)
+            batch.append(item)
+            count += len(item[0])
+        self._pending_texts -= count
+        if self._pending_texts < self.max_batch_size:
+            self._full.clear()
+        return batch
+
+    async def _run(self):
+        while self._pending:
+            if self._pending_texts < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._take_batch()
+            started = time.perf_counter()
+            waits = [started - enqueued_at for _, _, enqueued_at in batch]
+
+            # Identical texts across callers are encoded once
+            unique = list(dict.fromkeys(text for texts, _, _ in batch for text in texts))
+            total = sum(len(texts) for texts, _, _ in batch)
+
+            try:
+                vectors = np.asarray(await self.encode(unique), dtype=np.float32)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            encode_s = time.perf_counter() - started
+
+            rows = {text: i for i, text in enumerate(unique)}
+            for texts, future, _ in batch:
+                if not future.done():  # caller may have been cancelled
+                    future.set_result(vectors[[rows[t] for t in texts]])
+
+            self.batches += 1
+            self.completed += len(batch)
+            self.texts += len(unique)
+            self.deduplicated += total - len(unique)
+            self.max_batch = max(self.max_batch, len(unique))
+            self.queue_wait_s_total += sum(waits)
+            self.queue_wait_s_max = max(self.queue_wait_s_max, max(waits))
+            self.encode_s_total += encode_s
+            if self.on_batch is not None:
+                self.on_batch(len(unique), waits, encode_s)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "deduplicated": self.deduplicated,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "queue_wait_ms_avg": round(self.queue_wait_s_total / self.completed * 1000, 3) if self.completed else 0.0,
+            "queue_wait_ms_max": round(self.queue_wait_s_max * 1000, 3),
+            "texts_per_s": round(self.texts / self.encode_s_total, 1) if self.encode_s_total else 0.0,
+            "pending": self._pending_texts,
+        }
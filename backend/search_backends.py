@@ -0,0 +1,645 @@
+"""
+Phase 3: Pluggable component search backends
+Both backends take pre-computed query embeddings and return the same
+result dicts, so main.py can switch between them with SEARCH_BACKEND.
+
+- pgvector: ORDER BY embedding <=> query in Postgres (default); per-query
+            hnsw.ef_search / ivfflat.probes derived from the current index
+- memory:   pre-normalized embeddings in one contiguous NumPy matrix,
+            partitioned by category, refreshed from the components table
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+import metrics
+import tracing
+from vector_index import DEFAULT_EF_SEARCH, INDEX_INFO_SQL, parse_index
+
+
+# Rows fetched per round trip while loading the in-memory index
+LOAD_BATCH_ROWS = 10000
+
+# pgvector caps hnsw.ef_search at 1000
+MAX_EF_SEARCH = 1000
+
+# Share assumed for categories missing from pg_stats (rare ones), and the
+# floor for widening the scan (at most 1/0.01 = 100x the base effort)
+MIN_CATEGORY_FRACTION = 0.01
+
+
+def pgvector_version(version):
+    """'0.8.0' -> (0, 8, 0); unknown -> (0,)"""
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except (AttributeError, ValueError):
+        return (0,)
+
+
+def to_pgvector(embedding) -> str:
+    """Format an embedding as a pgvector text literal ('[0.1,0.2,...]')"""
+    return '[' + ','.join(str(float(x)) for x in embedding) + ']'
+
+
+# ============================================
+# pgvector (database) backend
+# ============================================
+
+class PgvectorBackend:
+    """Vector search inside Postgres.
+
+    Search effort follows the ANN index built by vector_index.py: its
+    recommended ef_search / probes (or the ones given here) are scaled by a
+    per-query `effort` factor, or overridden per query, and applied with
+    SET LOCAL semantics so pooled connections are left untouched.
+
+    Args:
+        connection: `async with connection() as conn` factory (the API pool)
+        ef_search: Default hnsw.ef_search (None = index recommendation)
+        probes: Default ivfflat.probes (None = index recommendation)
+        index_refresh_interval: Seconds between re-reads of the index description
+        code_cache: Optional ComponentCodeCache; winners' code then comes from
+            memory (checked against the row's updated_at) instead of the query
+    """
+
+    name = "pgvector"
+
+    def __init__(self, connection, ef_search=None, probes=None, index_refresh_interval=30.0,
+                 code_cache=None):
+        self.connection = connection
+        self.code_cache = code_cache
+        self.ef_search = ef_search
+        self.probes = probes
+        self.index_refresh_interval = index_refresh_interval
+        self.index_info = parse_index(None)
+        self.iterative_scan = False
+        self.category_fractions = {}
+        self._index_checked_at = None
+
+    async def _load_index_info(self, conn):
+        row = await conn.fetchrow(INDEX_INFO_SQL)
+        self.index_info = parse_index(row[0], row[1]) if row else parse_index(None)
+        version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+        self.iterative_scan = pgvector_version(version) >= (0, 8)
+        if not self.iterative_scan:
+            # Planner statistics: cheap, and close enough to size ef_search / probes
+            stats = await conn.fetchrow("""
+                SELECT most_common_vals::text::text[], most_common_freqs
+                FROM pg_stats
+                WHERE schemaname = current_schema() AND tablename = 'components' AND attname = 'category';
+            """)
+            self.category_fractions = dict(zip(stats[0], stats[1])) if stats and stats[0] else {}
+        self._index_checked_at = time.monotonic()
+
+    async def load_index_info(self):
+        async with self.connection() as conn:
+            await self._load_index_info(conn)
+
+    def search_settings(self, limit, effort=1.0, ef_search=None, probes=None, categories=None):
+        """Planner settings for one query; explicit values win over effort scaling.
+
+        The category filter is applied after the ANN scan, so a scan sized
+        for `limit` can come back short for a small category. With pgvector
+        0.8+ the scan is made iterative (it continues until enough rows pass
+        the filter); on older versions ef_search / probes are scaled by the
+        inverse of the rarest requested category's share of the table.
+        """
+        settings = {}
+        method = self.index_info["method"]
+        categories = [c for c in categories or [] if c]
+
+        widen = 1.0
+        if categories and not self.iterative_scan:
+            fraction = min(self.category_fractions.get(c, MIN_CATEGORY_FRACTION) for c in categories)
+            widen = 1 / max(fraction, MIN_CATEGORY_FRACTION)
+
+        if method == "hnsw" or ef_search:
+            base = self.ef_search or self.index_info.get("ef_search", DEFAULT_EF_SEARCH)
+            # HNSW returns at most ef_search rows, so never go below the limit
+            value = max(ef_search or round(base * effort * widen), limit)
+            settings["hnsw.ef_search"] = min(value, MAX_EF_SEARCH)
+            if categories and self.iterative_scan:
+                settings["hnsw.iterative_scan"] = "strict_order"
+
+        if method == "ivfflat" or probes:
+            base = self.probes or self.index_info.get("probes", 1)
+            value = max(1, probes or round(base * effort * widen))
+            lists = self.index_info.get("params", {}).get("lists")
+            settings["ivfflat.probes"] = min(value, lists) if lists else value
+            if categories and self.iterative_scan:
+                # ivfflat only supports relaxed ordering; callers re-sort by similarity
+                settings["ivfflat.iterative_scan"] = "relaxed_order"
+
+        return settings
+
+    @asynccontextmanager
+    async def _tuned_connection(self, limit, effort=1.0, ef_search=None, probes=None, categories=None):
+        async with self.connection() as conn:
+            if (self._index_checked_at is None
+                    or time.monotonic() - self._index_checked_at > self.index_refresh_interval):
+                await self._load_index_info(conn)
+
+            settings = self.search_settings(limit, effort, ef_search, probes, categories)
+            if not settings:
+                yield conn
+                return
+
+            # set_config(..., true) only lasts until the end of this transaction
+            async with conn.transaction():
+                await conn.execute("SELECT " + ", ".join(
+                    f"set_config('{name}', '{value}', true)" for name, value in settings.items()
+                ))
+                yield conn
+
+    async def search(self, embedding, category=None, limit=5, effort=1.0, ef_search=None, probes=None):
+        """Top `limit` components for one query embedding"""
+        query_embedding = [float(x) for x in embedding]
+
+        async with self._tuned_connection(limit, effort, ef_search, probes, [category]) as conn:
+            if category:
+                results = await conn.fetch("""
+                    SELECT id, category, description, style_tags,
+                           1 - (embedding <=> $1::float4[]::vector) as similarity
+                    FROM components
+                    WHERE category = $2
+                    ORDER BY embedding <=> $1::float4[]::vector
+                    LIMIT $3;
+                """, query_embedding, category, limit)
+            else:
+                results = await conn.fetch("""
+                    SELECT id, category, description, style_tags,
+                           1 - (embedding <=> $1::float4[]::vector) as similarity
+                    FROM components
+                    ORDER BY embedding <=> $1::float4[]::vector
+                    LIMIT $2;
+                """, query_embedding, limit)
+
+        matches = [
+            {
+                "id": row[0],
+                "category": row[1],
+                "description": row[2],
+                "style_tags": row[3],
+                "similarity": float(row[4])
+            }
+            for row in results
+        ]
+        # ivfflat's iterative scan may return rows slightly out of order
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches
+
+    async def search_by_category(self, embeddings, categories, limit=1, effort=1.0,
+                                 ef_search=None, probes=None):
+        """Top `limit` components per (embedding, category) pair, with code.
+
+        One LATERAL query resolves every pair and returns code, props_schema,
+        updated_at and precomputed token counts for the winners. Returns one list per pair, in order.
+        With a code cache, the query returns only ids and updated_at and the
+        code is read from the cache. The "vector_search" stage times the
+        query alone (without a cache it also carries the winners' code).
+        """
+        if not categories:
+            return []
+        if self.code_cache is not None:
+            return await self._search_by_category_cached(embeddings, categories, limit, effort,
+                                                         ef_search, probes)
+
+        with metrics.stage_timer("vector_search"):
+            async with self._tuned_connection(limit, effort, ef_search, probes, categories) as conn:
+                rows = await conn.fetch("""
+                    WITH q AS (
+                        SELECT t.ord, t.category, t.query_embedding::vector AS query_embedding
+                        FROM unnest($1::text[], $2::text[]) WITH ORDINALITY
+                             AS t(category, query_embedding, ord)
+                    )
+                    SELECT q.ord, q.category, m.id, m.description, m.style_tags,
+                           m.code, m.props_schema, m.similarity, m.updated_at,
+                           m.code_tokens, m.interface_view, m.interface_tokens
+                    FROM q
+                    CROSS JOIN LATERAL (
+                        SELECT c.id, c.description, c.style_tags, c.code, c.props_schema,
+                               c.updated_at, c.code_tokens, c.interface_view, c.interface_tokens,
+                               1 - (c.embedding <=> q.query_embedding) AS similarity
+                        FROM components c
+                        WHERE c.category = q.category
+                        ORDER BY c.embedding <=> q.query_embedding
+                        LIMIT $3
+                    ) m
+                    ORDER BY q.ord, m.similarity DESC;
+                """, list(categories), [to_pgvector(e) for e in embeddings], limit)
+
+        matches = [[] for _ in categories]
+        for row in rows:
+            matches[row[0] - 1].append({
+                "id": row[2],
+                "category": row[1],
+                "description": row[3],
+                "style_tags": row[4],
+                "code": row[5],
+                "props_schema": row[6],
+                "similarity": float(row[7]),
+                "updated_at": row[8],
+                "code_tokens": row[9],
+                "interface_view": row[10],
+                "interface_tokens": row[11]
+            })
+
+        return matches
+
+    async def _search_by_category_cached(self, embeddings, categories, limit, effort,
+                                         ef_search, probes):
+        with metrics.stage_timer("vector_search"):
+            async with self._tuned_connection(limit, effort, ef_search, probes, categories) as conn:
+                rows = await conn.fetch("""
+                    WITH q AS (
+                        SELECT t.ord, t.category, t.query_embedding::vector AS query_embedding
+                        FROM unnest($1::text[], $2::text[]) WITH ORDINALITY
+                             AS t(category, query_embedding, ord)
+                    )
+                    SELECT q.ord, q.category, m.id, m.description, m.style_tags,
+                           m.similarity, m.updated_at
+                    FROM q
+                    CROSS JOIN LATERAL (
+                        SELECT c.id, c.description, c.style_tags, c.updated_at,
+                               1 - (c.embedding <=> q.query_embedding) AS similarity
+                        FROM components c
+                        WHERE c.category = q.category
+                        ORDER BY c.embedding <=> q.query_embedding
+                        LIMIT $3
+                    ) m
+                    ORDER BY q.ord, m.similarity DESC;
+                """, list(categories), [to_pgvector(e) for e in embeddings], limit)
+
+        records = await self.code_cache.get_many(
+            [row[2] for row in rows], versions={row[2]: row[6] for row in rows}
+        )
+
+        matches = [[] for _ in categories]
+        for row in rows:
+            if row[2] not in records:
+                continue  # deleted between the search and the code fetch
+            match = {
+                "id": row[2],
+                "category": row[1],
+                "description": row[3],
+                "style_tags": row[4],
+                "similarity": float(row[5])
+            }
+            match.update(records[row[2]])
+            matches[row[0] - 1].append(match)
+
+        return matches
+
+    async def search_many(self, embeddings, categories, limits, effort=1.0, ef_search=None, probes=None):
+        """Top `limits[i]` components for each (embedding, category) pair, no code.
+
+        Category-filtered and unfiltered queries are resolved with one
+        LATERAL statement each, on one connection. Returns one entry per
+        pair, in order: a result list, or the exception that failed its group.
+        """
+        categories = [category or None for category in categories]  # "" = no filter, as in search()
+        groups = {True: [], False: []}  # filtered? -> positions
+        for i, category in enumerate(categories):
+            groups[category is not None].append(i)
+
+        matches = [None] * len(categories)
+        async with self._tuned_connection(max(limits, default=1), effort, ef_search, probes,
+                                          categories) as conn:
+            for filtered, positions in groups.items():
+                if not positions:
+                    continue
+                try:
+                    # Savepoint: a failed group must not abort the other one
+                    async with conn.transaction():
+                        rows = await conn.fetch(f"""
+                            WITH q AS (
+                                SELECT t.ord, t.category, t.lim, t.query_embedding::vector AS query_embedding
+                                FROM unnest($1::int[], $2::text[], $3::text[], $4::int[])
+                                     AS t(ord, category, query_embedding, lim)
+                            )
+                            SELECT q.ord, m.id, m.category, m.description, m.style_tags, m.similarity
+                            FROM q
+                            CROSS JOIN LATERAL (
+                                SELECT c.id, c.category, c.description, c.style_tags,
+                                       1 - (c.embedding <=> q.query_embedding) AS similarity
+                                FROM components c
+                                {"WHERE c.category = q.category" if filtered else ""}
+                                ORDER BY c.embedding <=> q.query_embedding
+                                LIMIT q.lim
+                            ) m
+                            ORDER BY q.ord, m.similarity DESC;
+                        """,
+                            positions,
+                            [categories[i] for i in positions],
+                            [to_pgvector(embeddings[i]) for i in positions],
+                            [limits[i] for i in positions])
+                except Exception as e:
+                    for i in positions:
+                        matches[i] = e
+                    continue
+
+                for i in positions:
+                    matches[i] = []
+                for row in rows:
+                    matches[row[0]].append({
+                        "id": row[1],
+                        "category": row[2],
+                        "description": row[3],
+                        "style_tags": row[4],
+                        "similarity": float(row[5])
+                    })
+
+        return matches
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "index": self.index_info,
+            "default_settings": self.search_settings(limit=1),
+        }
+
+
+# ============================================
+# In-memory (NumPy) backend
+# ============================================
+
+class ComponentIndex:
+    """Immutable snapshot of the component library for brute-force search.
+
+    Rows are sorted by category so each category is one contiguous slice of
+    a single L2-normalized float32 matrix; cosine similarity is then one
+    matrix-vector product, and top-k is an argpartition over the scores.
+    With copy=False an already sorted float32 `embeddings` array is
+    normalized in place instead of copied (InMemoryBackend.load owns it).
+    """
+
+    def __init__(self, ids, categories, descriptions, style_tags, embeddings, updated_at=None,
+                 copy=True):
+        order = sorted(range(len(ids)), key=lambda i: (categories[i], ids[i]))
+
+        self.ids = [ids[i] for i in order]
+        self.categories = [categories[i] for i in order]
+        self.descriptions = [descriptions[i] for i in order]
+        self.style_tags = [style_tags[i] for i in order]
+        # id -> updated_at of the row this snapshot was built from (code cache versions)
+        self.updated_at = dict(zip(ids, updated_at)) if updated_at is not None else {}
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if len(order):
+            if order != list(range(len(order))):
+                matrix = matrix[order]
+            elif copy or not matrix.flags.writeable:
+                # Never normalize the caller's buffer (e.g. a read-only memmap) in place
+                matrix = np.array(matrix, dtype=np.float32, copy=True)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.maximum(norms, 1e-12)
+        self.matrix = np.ascontiguousarray(matrix)
+
+        # category -> (start, end) row slice
+        self.partitions = {}
+        for row, category in enumerate(self.categories):
+            start, _ = self.partitions.get(category, (row, row))
+            self.partitions[category] = (start, row + 1)
+
+    @classmethod
+    def from_components(cls, components):
+        """Build from dicts with id/category/description/style_tags/embedding"""
+        return cls(
+            [c['id'] for c in components],
+            [c['category'] for c in components],
+            [c.get('description', '') for c in components],
+            [c.get('style_tags', []) for c in components],
+            [c['embedding'] for c in components]
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, embedding, category=None, limit=5):
+        """Top `limit` components by cosine similarity ("" or None = all categories)"""
+        if category:
+            start, end = self.partitions.get(category, (0, 0))
+        else:
+            start, end = 0, len(self.ids)
+
+        k = min(limit, end - start)
+        if k <= 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        scores = self.matrix[start:end] @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {
+                "id": self.ids[start + i],
+                "category": self.categories[start + i],
+                "description": self.descriptions[start + i],
+                "style_tags": self.style_tags[start + i],
+                "similarity": float(scores[i])
+            }
+            for i in top
+        ]
+
+    def search_many(self, embeddings, categories, limits):
+        """search() for many queries: one matrix product per category partition"""
+        matches = [None] * len(categories)
+        groups = {}
+        for i, category in enumerate(categories):
+            groups.setdefault(category or None, []).append(i)
+
+        for category, positions in groups.items():
+            if category is not None:
+                start, end = self.partitions.get(category, (0, 0))
+            else:
+                start, end = 0, len(self.ids)
+            if end <= start:
+                for i in positions:
+                    matches[i] = []
+                continue
+
+            queries = np.asarray([embeddings[i] for i in positions], dtype=np.float32)
+            queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            scores = self.matrix[start:end] @ queries.T  # (rows, queries)
+
+            for column, i in enumerate(positions):
+                column_scores = scores[:, column]
+                k = min(limits[i], end - start)
+                if k <= 0:
+                    matches[i] = []
+                    continue
+                if k < len(column_scores):
+                    top = np.argpartition(-column_scores, k - 1)[:k]
+                else:
+                    top = np.arange(len(column_scores))
+                top = top[np.argsort(-column_scores[top])]
+                matches[i] = [
+                    {
+                        "id": self.ids[start + r],
+                        "category": self.categories[start + r],
+                        "description": self.descriptions[start + r],
+                        "style_tags": self.style_tags[start + r],
+                        "similarity": float(column_scores[r])
+                    }
+                    for r in top
+                ]
+
+        return matches
+
+
+class InMemoryBackend:
+    """Serves searches from a ComponentIndex held in process memory.
+
+    The index is loaded from the components table and rebuilt whenever the
+    table's row count or latest updated_at changes (checked every
+    `refresh_interval` seconds). Only winners' code is read from Postgres,
+    or from the code cache when one is given.
+
+    Args:
+        connection: `async with connection() as conn` factory (the API pool)
+        refresh_interval: Seconds between change checks
+        code_cache: Optional ComponentCodeCache for the winners' code
+        tracer: tracing.Tracer for the code query's "db.code_fetch" span
+    """
+
+    name = "memory"
+
+    def __init__(self, connection, refresh_interval=30.0, code_cache=None, tracer=None):
+        self.connection = connection
+        self.code_cache = code_cache
+        self.tracer = tracer or tracing.Tracer(enabled=False)
+        self.refresh_interval = refresh_interval
+        self.index = ComponentIndex([], [], [], [], np.zeros((0, 0), dtype=np.float32))
+        self.version = None
+        self.loaded_at = None
+        self.load_ms = 0.0
+        self.reloads = 0
+
+    async def _table_version(self, conn):
+        row = await conn.fetchrow("SELECT COUNT(*), MAX(updated_at) FROM components;")
+        return (row[0], row[1])
+
+    async def load(self):
+        """(Re)build the index from the components table"""
+        start = time.perf_counter()
+
+        ids, categories, descriptions, style_tags, updated_at = [], [], [], [], []
+        matrix = np.zeros((0, 0), dtype=np.float32)
+        async with self.connection() as conn:
+            # One snapshot for the row count and the rows, so the matrix fits
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                version = await self._table_version(conn)
+                # vector_send: int16 dim, int16 unused, then big-endian float4s.
+                # Rows are copied straight into a preallocated float32 matrix
+                # instead of becoming lists of Python floats, already in the
+                # index's (category, id) order so it is not copied again
+                async for row in conn.cursor("""
+                    SELECT id, category, description, style_tags, updated_at, vector_send(embedding)
+                    FROM components
+                    ORDER BY category COLLATE "C", id COLLATE "C";
+                """, prefetch=LOAD_BATCH_ROWS):
+                    vector = np.frombuffer(row[5], dtype='>f4', offset=4)
+                    if not ids:
+                        matrix = np.empty((version[0], len(vector)), dtype=np.float32)
+                    matrix[len(ids)] = vector
+                    ids.append(row[0])
+                    categories.append(row[1])
+                    descriptions.append(row[2])
+                    style_tags.append(row[3])
+                    updated_at.append(row[4])
+
+        # Normalizing and sorting a large library is CPU work; keep it off the loop
+        index = await asyncio.to_thread(
+            ComponentIndex, ids, categories, descriptions, style_tags, matrix[:len(ids)], updated_at,
+            copy=False
+        )
+
+        self.index = index
+        self.version = version
+        self.loaded_at = time.time()
+        self.load_ms = (time.perf_counter() - start) * 1000
+        self.reloads += 1
+        print(f"🧮 In-memory index loaded: {len(index)} components in {self.load_ms:.0f}ms")
+
+    async def refresh_if_changed(self):
+        async with self.connection() as conn:
+            version = await self._table_version(conn)
+        if version != self.version:
+            await self.load()
+
+    async def run_refresher(self):
+        """Background task: poll for table changes until cancelled"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_if_changed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  In-memory index refresh failed: {e}")
+
+    async def search(self, embedding, category=None, limit=5, **tuning):
+        # Exact search: ANN tuning (effort / ef_search / probes) does not apply
+        return await asyncio.to_thread(self.index.search, embedding, category, limit)
+
+    async def search_many(self, embeddings, categories, limits, **tuning):
+        return await asyncio.to_thread(self.index.search_many, embeddings, categories, limits)
+
+    async def search_by_category(self, embeddings, categories, limit=1, **tuning):
+        """Index lookups per pair, then one query for the winners' code"""
+        index = self.index
+        with metrics.stage_timer("vector_search"):
+            matches = await asyncio.to_thread(
+                lambda: [index.search(e, c, limit) for e, c in zip(embeddings, categories)]
+            )
+
+        ids = list({m['id'] for results in matches for m in results})
+        if ids and self.code_cache is not None:
+            # Never serve code older than the row the index was built from
+            records = await self.code_cache.get_many(
+                ids, versions={i: index.updated_at.get(i) for i in ids}
+            )
+            for results in matches:
+                results[:] = [m for m in results if m['id'] in records]
+                for m in results:
+                    m.update(records[m['id']])
+        elif ids:
+            with metrics.stage_timer("code_fetch"), \
+                    self.tracer.span("db.code_fetch", ids=len(ids)) as span:
+                async with self.connection() as conn:
+                    rows = await conn.fetch("""
+                        SELECT id, code, props_schema, updated_at,
+                               code_tokens, interface_view, interface_tokens
+                        FROM components
+                        WHERE id = ANY($1::text[]);
+                    """, ids)
+                span.set(rows=len(rows))
+            details = {row[0]: row for row in rows}
+            for results in matches:
+                # Drop winners deleted since the last index refresh
+                results[:] = [m for m in results if m['id'] in details]
+                for m in results:
+                    row = details[m['id']]
+                    m['code'], m['props_schema'], m['updated_at'] = row[1], row[2], row[3]
+                    m['code_tokens'], m['interface_view'], m['interface_tokens'] = row[4], row[5], row[6]
+
+        return matches
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "components": len(self.index),
+            "categories": len(self.index.partitions),
+            "loaded_at": self.loaded_at,
+            "load_ms": round(self.load_ms, 1),
+            "reloads": self.reloads,
+        }
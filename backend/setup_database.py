@@ -7,6 +7,7 @@ import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import os
 from dotenv import load_dotenv
+from component_cache import CHANNEL as COMPONENT_CHANNEL, ensure_notify_trigger
 
 # Load environment variables
 load_dotenv()
@@ -58,6 +59,9 @@ try:
             description TEXT NOT NULL,
             source TEXT NOT NULL,
             code TEXT NOT NULL,
+            code_tokens INTEGER,
+            interface_view TEXT,
+            interface_tokens INTEGER,
             embedding vector(384) NOT NULL,
             usage_count INTEGER DEFAULT 0,
             avg_rating FLOAT DEFAULT 0.0,
@@ -79,12 +83,9 @@ try:
     cursor.execute("CREATE INDEX idx_complexity ON components(complexity);")
     print("   ✅ Complexity index created")
     
-    cursor.execute("""
-        CREATE INDEX idx_embedding ON components 
-        USING ivfflat (embedding vector_cosine_ops)
-        WITH (lists = 100);
-    """)
-    print("   ✅ Vector similarity index created\n")
+    # The ANN index depends on the row count, so it is built after loading
+    # data (upload_to_db.py / ingest_components.py call vector_index.py)
+    print("   ⏭️  Vector index deferred until components are loaded\n")
     
     # Step 5: Create search function
     print("🔍 Step 5: Creating search function...")
@@ -135,8 +136,51 @@ try:
     """)
     print("   ✅ Search function created\n")
     
-    # Step 6: Verify setup
-    print("✅ Step 6: Verifying database setup...")
+    # Step 6: Create query embedding cache table (shared by all API workers)
+    print("🧠 Step 6: Creating query embedding cache table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS query_embedding_cache (
+            model TEXT NOT NULL,
+            query_hash TEXT NOT NULL,
+            query TEXT NOT NULL,
+            embedding REAL[] NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (model, query_hash)
+        );
+    """)
+    print("   ✅ Embedding cache table created\n")
+    
+    # Step 7: Create generation result cache table
+    print("♻️  Step 7: Creating generation cache table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generation_cache (
+            cache_key TEXT PRIMARY KEY,
+            prompt TEXT NOT NULL,
+            component_ids TEXT[] NOT NULL,
+            response JSONB NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            hit_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT NOW(),
+            last_accessed_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_generation_cache_components
+        ON generation_cache USING GIN(component_ids);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_generation_cache_last_accessed
+        ON generation_cache(last_accessed_at);
+    """)
+    print("   ✅ Generation cache table created\n")
+    
+    # Step 8: Notify API workers when components change (component code cache)
+    print("📣 Step 8: Creating component change notification triggers...")
+    ensure_notify_trigger(cursor)
+    print(f"   ✅ Writes to components NOTIFY '{COMPONENT_CHANNEL}'\n")
+    
+    # Step 9: Verify setup
+    print("✅ Step 9: Verifying database setup...")
     cursor.execute("""
         SELECT column_name, data_type 
         FROM information_schema.columns 
@@ -159,10 +203,13 @@ try:
     print("=" * 80)
     print("\n📋 What was created:")
     print("   ✅ pgvector extension enabled")
-    print("   ✅ components table with 15 columns")
+    print("   ✅ components table with 18 columns")
     print("   ✅ 4 indexes for fast filtering")
-    print("   ✅ Vector similarity search index")
+    print("   ✅ Vector index: built by vector_index.py after upload")
     print("   ✅ search_components() function")
+    print("   ✅ query_embedding_cache table")
+    print("   ✅ generation_cache table")
+    print("   ✅ components change notification triggers")
     print("\n🎯 Next step: Run upload_to_db.py to import your components")
 
 except Exception as e:
@@ -3,9 +3,9 @@ Phase 1: Test component search/retrieval
 Load embeddings and search by natural language query
 """
 
-import json
-import numpy as np
 from sentence_transformers import SentenceTransformer
+from embedding_store import EmbeddingArtifact
+from search_backends import ComponentIndex
 
 print("🔍 Component Search System\n")
 print("Loading model and embeddings...")
@@ -13,9 +13,19 @@ print("Loading model and embeddings...")
 # Load model
 model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
 
-# Load embeddings
-with open('./embeddings.json', 'r', encoding='utf-8') as f:
-    components = json.load(f)
+# Load embeddings (memory-mapped matrix + metadata sidecar)
+artifact = EmbeddingArtifact()
+components = list(artifact.records())
+
+# Build the vectorized index (one normalized matrix, partitioned by category)
+index = ComponentIndex(
+    artifact.ids,
+    artifact.categories,
+    [c['description'] for c in components],
+    [c['style_tags'] for c in components],
+    artifact.matrix
+)
+components_by_id = {c['id']: c for c in components}
 
 print(f"✅ Loaded {len(components)} components\n")
 
@@ -36,27 +46,14 @@ def search_components(query, category=None, top_k=5):
     # Embed the search query
     query_embedding = model.encode(query)
     
-    # Filter by category if specified
-    candidates = components
-    if category:
-        candidates = [c for c in components if c['category'] == category]
-    
-    # Calculate cosine similarity for each component
-    for comp in candidates:
-        comp_embedding = np.array(comp['embedding'])
-        
-        # Cosine similarity formula
-        similarity = np.dot(query_embedding, comp_embedding) / (
-            np.linalg.norm(query_embedding) * np.linalg.norm(comp_embedding)
-        )
-        
-        comp['similarity'] = float(similarity)
-    
-    # Sort by similarity (highest first)
-    candidates.sort(key=lambda x: x['similarity'], reverse=True)
+    # Cosine similarity against every candidate in one matrix-vector product
+    results = []
+    for match in index.search(query_embedding, category=category, limit=top_k):
+        comp = dict(components_by_id[match['id']])
+        comp['similarity'] = match['similarity']
+        results.append(comp)
     
-    # Return top K results
-    return candidates[:top_k]
+    return results
 
 
 def display_results(results):
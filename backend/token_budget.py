@@ -0,0 +1,99 @@
+"""
+Phase 3: Token accounting for component context
+Token counts and a compact "interface view" (exported signature + props
+interface + props_schema) are computed once at ingest and stored on the
+components row. At generation time the budget manager picks, per
+component, full source or interface view so the prompt fits a token limit.
+"""
+
+import json
+import re
+
+# gpt-4o / gpt-4o-mini tokenizer
+TOKEN_ENCODING = "o200k_base"
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Exact token count with tiktoken, or the ~4 chars/token estimate if
+    the tokenizer cannot be loaded (not installed, or no network on first use)"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception:
+            _encoder = False
+    if _encoder is False:
+        return len(text) // 4
+    return len(_encoder.encode(text, disallowed_special=()))
+
+
+def _balanced_block(code: str, start: int) -> str:
+    """Text from `start` through the brace that closes the first '{' after it"""
+    depth = 0
+    for i in range(code.index('{', start), len(code)):
+        if code[i] == '{':
+            depth += 1
+        elif code[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return code[start:i + 1]
+    return code[start:]
+
+
+def extract_interface_view(component_id: str, code: str, props_schema) -> str:
+    """Compact stand-in for a component's source: what the composer needs to
+    import it and set its props, without the JSX body"""
+    parts = [
+        f"// {component_id}: interface view (full source omitted to fit the token budget)",
+        f"// props_schema: {json.dumps(props_schema)}",
+    ]
+
+    # Props interfaces / types
+    for match in re.finditer(r'^(?:export\s+)?(?:interface|type)\s+\w+[^\n]*\{', code, re.MULTILINE):
+        parts.append(_balanced_block(code, match.start()))
+
+    # Exported component signatures, as declarations
+    for line in code.splitlines():
+        stripped = line.strip()
+        if not stripped.startswith('export ') or re.match(r'export\s+(?:interface|type)\b', stripped):
+            continue
+        signature = stripped.split(' = ', 1)[0].rstrip(' {(')
+        signature = re.sub(r'^export\s+(default\s+)?', r'export \1declare ', signature)
+        parts.append(signature + ';')
+
+    return '\n'.join(parts)
+
+
+def fit_to_budget(components, budget_tokens: int):
+    """Choose full source or interface view per component to fit the budget.
+
+    Args:
+        components: dicts with code_tokens and interface_tokens
+        budget_tokens: Tokens available for the components context
+
+    Returns (representations, total_tokens), where representations[i] is
+    "full" or "interface" for components[i]. Components whose interface
+    view saves the most tokens are downgraded first; if even all interface
+    views exceed the budget, all are interface views and the total is over.
+    """
+    representations = ["full"] * len(components)
+    total = sum(comp['code_tokens'] for comp in components)
+
+    by_savings = sorted(
+        range(len(components)),
+        key=lambda i: components[i]['code_tokens'] - components[i]['interface_tokens'],
+        reverse=True
+    )
+    for i in by_savings:
+        if total <= budget_tokens:
+            break
+        savings = components[i]['code_tokens'] - components[i]['interface_tokens']
+        if savings <= 0:
+            continue
+        representations[i] = "interface"
+        total -= savings
+
+    return representations, total
@@ -0,0 +1,280 @@
+"""
+Phase 3: Lightweight per-request tracing
+Each API request gets a request ID and a tree of timed spans (DB queries,
+embedding encodes, LLM calls) with attributes such as row counts, token
+counts and similarity scores. Finished traces are:
+
+- appended to a rotating JSONL file by a background writer thread (the
+  request path only does a non-blocking queue put; traces are dropped, and
+  counted, if the writer falls behind)
+- kept in a bounded in-memory buffer for GET /debug/traces
+
+The current trace and span live in context variables, so spans nest
+correctly across awaits without passing anything through function calls.
+Spans opened outside a trace are no-ops.
+"""
+
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, name, parent_id, attributes):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, trace_start):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - trace_start) * 1000, 3),
+            "duration_ms": round(((self.end or time.perf_counter()) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() when no trace is active"""
+
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request; the root span covers the whole request"""
+
+    def __init__(self, name, request_id=None, attributes=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.root = Span(name, None, dict(attributes or {}))
+        self.spans = [self.root]
+
+    def to_dict(self):
+        start = self.root.start
+        return {
+            "request_id": self.request_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": round(((self.root.end or time.perf_counter()) - start) * 1000, 3),
+            "error": self.root.error,
+            "attributes": self.root.attributes,
+            "spans": [span.to_dict(start) for span in self.spans[1:]],
+        }
+
+
+class JsonlWriter:
+    """Background thread appending JSON lines to a size-rotated file.
+
+    Args:
+        path: Active file; rotated copies are path.1 ... path.<backups>
+        max_bytes: Rotate once the active file reaches this size
+        backups: Rotated files kept
+        queue_size: Records buffered before write() starts dropping
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """Enqueue without blocking; returns False if the record was dropped"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        """Flush what is queued and stop the thread"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, 'a', encoding='utf-8')
+        try:
+            while True:
+                records = [self._queue.get()]
+                # Drain whatever else is ready so bursts cost one flush
+                while not self._queue.empty() and len(records) < 1000:
+                    records.append(self._queue.get_nowait())
+
+                stop = None in records
+                for record in records:
+                    if record is None:
+                        continue
+                    try:
+                        f.write(json.dumps(record, default=str) + "\n")
+                        self.written += 1
+                    except (TypeError, ValueError, OSError):
+                        self.errors += 1
+                f.flush()
+
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+                    f = open(self.path, 'a', encoding='utf-8')
+                if stop:
+                    break
+        finally:
+            f.close()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self._queue.qsize(),
+        }
+
+
+class Tracer:
+    """Creates traces and spans, exports finished traces.
+
+    Args:
+        writer: JsonlWriter, or None to keep traces in memory only
+        recent: Finished traces kept for /debug/traces
+        enabled: False turns trace() and span() into no-ops
+    """
+
+    def __init__(self, writer=None, recent=500, enabled=True):
+        self.writer = writer
+        self.enabled = enabled
+        self.recent = deque(maxlen=recent)
+
+    @contextmanager
+    def trace(self, name, request_id=None, **attributes):
+        """Root context for one request: `with tracer.trace("generate") as trace: ...`"""
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(name, request_id, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.root.end = time.perf_counter()
+            try:
+                _current_span.reset(span_token)
+                _current_trace.reset(trace_token)
+            except ValueError:
+                pass  # streamed response closed from another context
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Child of the current span: `with tracer.span("db.search", rows=3) as span: ...`"""
+        trace = _current_trace.get()
+        if trace is None:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(name, parent.span_id if parent else None, attributes)
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.perf_counter()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                pass
+
+    @staticmethod
+    def current_request_id():
+        trace = _current_trace.get()
+        return trace.request_id if trace else None
+
+    def _finish(self, trace):
+        record = trace.to_dict()
+        self.recent.append(record)
+        if self.writer is not None:
+            self.writer.write(record)
+
+    def slowest(self, limit=20, name=None):
+        """Slowest of the recently finished traces, optionally for one endpoint"""
+        # Snapshot first: list(deque) is atomic, iterating it while the event
+        # loop appends raises "deque mutated during iteration"
+        traces = [t for t in list(self.recent) if name is None or t["name"] == name]
+        return sorted(traces, key=lambda t: t["duration_ms"], reverse=True)[:limit]
+
+    def get(self, request_id):
+        for record in list(self.recent):
+            if record["request_id"] == request_id:
+                return record
+        return None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "recent": len(self.recent),
+            "writer": self.writer.stats() if self.writer else None,
+        }
@@ -1,16 +1,27 @@
 """
-Phase 2: Upload components from embeddings.json to PostgreSQL
+Phase 2: Upload components from the embedding artifact to PostgreSQL
+With --delta, applies embeddings_delta.json (written by embed_components.py)
+instead: upserts added/changed components and deletes removed ones.
 """
 
+import argparse
 import json
 import psycopg2
-from psycopg2.extras import execute_values
 import os
+import time
 from dotenv import load_dotenv
+from bulk_load import ensure_columns, load_components
+from component_cache import ensure_notify_trigger
+from embedding_store import DEFAULT_PATH, EmbeddingArtifact, artifact_exists
+from vector_index import ensure_index
 
 # Load environment variables
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Upload component embeddings")
+parser.add_argument('--delta', action='store_true', help="Apply embeddings_delta.json instead of a full upload")
+args = parser.parse_args()
+
 print("📤 Uploading Components to Database")
 print("=" * 80 + "\n")
 
@@ -22,15 +33,33 @@ if not DATABASE_URL:
     exit(1)
 
 # Load embeddings
-print("📂 Loading embeddings.json...")
-try:
-    with open('./embeddings.json', 'r', encoding='utf-8') as f:
-        components = json.load(f)
-    print(f"✅ Loaded {len(components)} components\n")
-except FileNotFoundError:
-    print("❌ ERROR: embeddings.json not found")
-    print("   Run embed_components.py first!")
-    exit(1)
+deleted_ids = []
+if args.delta:
+    print("📂 Loading embeddings_delta.json...")
+    try:
+        with open('./embeddings_delta.json', 'r', encoding='utf-8') as f:
+            delta = json.load(f)
+        components = delta['upserted']
+        deleted_ids = delta['deleted']
+        print(f"✅ Loaded {len(components)} upserts, {len(deleted_ids)} deletes\n")
+    except FileNotFoundError:
+        print("❌ ERROR: embeddings_delta.json not found")
+        print("   Run embed_components.py first!")
+        exit(1)
+    
+    if not components and not deleted_ids:
+        print("✅ Nothing to apply, database already up to date")
+        exit(0)
+else:
+    print(f"📂 Opening {DEFAULT_PATH}.npy / .jsonl ...")
+    if not artifact_exists(DEFAULT_PATH):
+        print("❌ ERROR: embedding artifact not found")
+        print("   Run embed_components.py first!")
+        exit(1)
+    artifact = EmbeddingArtifact(DEFAULT_PATH)
+    # Streamed row by row into COPY; vectors come straight from the mmap
+    components = artifact.components()
+    print(f"✅ Opened {len(artifact)} components ({artifact.dtype})\n")
 
 # Connect to database
 print("📡 Connecting to database...")
@@ -42,59 +71,50 @@ except Exception as e:
     print(f"❌ Connection failed: {e}")
     exit(1)
 
-# Prepare data for bulk insert
-print("🔄 Preparing data for upload...")
-insert_data = []
-
-for comp in components:
-    insert_data.append((
-        comp['id'],
-        comp['filename'],
-        comp['category'],
-        comp['style_tags'],
-        comp['color_scheme'],
-        comp['complexity'],
-        json.dumps(comp['props_schema']),  # Convert dict to JSON
-        comp['dependencies'],
-        comp['description'],
-        comp['source'],
-        comp['code'],
-        comp['embedding']  # Already a list
-    ))
-
-print(f"✅ Prepared {len(insert_data)} records\n")
-
 # Upload to database
-print("📤 Uploading to database...")
+print("📤 Uploading to database (binary COPY → staging table → merge)...")
+upload_start = time.time()
 try:
-    # Use execute_values for efficient bulk insert
-    execute_values(
-        cursor,
-        """
-        INSERT INTO components (
-            id, filename, category, style_tags, color_scheme, 
-            complexity, props_schema, dependencies, description, 
-            source, code, embedding
-        ) VALUES %s
-        ON CONFLICT (id) DO UPDATE SET
-            filename = EXCLUDED.filename,
-            category = EXCLUDED.category,
-            style_tags = EXCLUDED.style_tags,
-            color_scheme = EXCLUDED.color_scheme,
-            complexity = EXCLUDED.complexity,
-            props_schema = EXCLUDED.props_schema,
-            dependencies = EXCLUDED.dependencies,
-            description = EXCLUDED.description,
-            source = EXCLUDED.source,
-            code = EXCLUDED.code,
-            embedding = EXCLUDED.embedding,
-            updated_at = NOW()
-        """,
-        insert_data
-    )
+    # Databases set up before token counts were stored lack their columns
+    added = ensure_columns(cursor)
+    if added:
+        print(f"🔨 Added missing columns: {', '.join(added)}")
+    
+    # Databases set up before the component code cache lack the NOTIFY trigger;
+    # without it API workers would keep serving the old code
+    if ensure_notify_trigger(cursor):
+        print("📣 Installed component change notification triggers")
+    
+    # Only rows whose content changed are written to components
+    inserted_ids, updated_ids, unchanged = load_components(cursor, components)
+    changed_ids = inserted_ids + updated_ids
+    
+    # Remove components deleted from the library (delta uploads only)
+    if deleted_ids:
+        cursor.execute("DELETE FROM components WHERE id = ANY(%s);", (deleted_ids,))
+        print(f"🗑️  Deleted {cursor.rowcount} components")
+    
+    # Invalidate cached generations built from any component we just wrote or removed
+    cursor.execute("SELECT to_regclass('generation_cache') IS NOT NULL;")
+    if cursor.fetchone()[0]:
+        cursor.execute(
+            "DELETE FROM generation_cache WHERE component_ids && %s::text[];",
+            (changed_ids + deleted_ids,)
+        )
+        invalidated = cursor.rowcount
+    else:
+        invalidated = 0
     
     conn.commit()
-    print(f"✅ Uploaded {len(insert_data)} components successfully!\n")
+    print(f"✅ Uploaded {len(changed_ids) + unchanged} components in {time.time() - upload_start:.1f}s")
+    print(f"   ➕ Inserted: {len(inserted_ids)}")
+    print(f"   ✏️  Updated: {len(updated_ids)}")
+    print(f"   ⏸️  Unchanged (not rewritten): {unchanged}")
+    print(f"♻️  Invalidated {invalidated} cached generations\n")
+    
+    # Applied: the next embed_components.py run starts a fresh delta
+    if args.delta:
+        os.replace('./embeddings_delta.json', './embeddings_delta.applied.json')
     
 except Exception as e:
     print(f"❌ Upload failed: {e}")
@@ -103,6 +123,16 @@ except Exception as e:
     conn.close()
     exit(1)
 
+# Resize/rebuild the ANN index if the table outgrew it (runs concurrently)
+print("📐 Checking vector index...")
+try:
+    index_action, index_plan, _ = ensure_index(conn)
+    print(f"✅ Vector index {index_action}: {index_plan['method']} {json.dumps(index_plan.get('params', {}))}\n")
+except Exception as e:
+    index_action, index_plan = "failed", {"method": "unknown"}
+    print(f"⚠️  Vector index rebuild failed (run vector_index.py manually): {e}\n")
+    conn.rollback()
+
 # Verify upload
 print("🔍 Verifying upload...")
 cursor.execute("SELECT COUNT(*) FROM components;")
@@ -143,6 +173,6 @@ print("=" * 80)
 print("\n📊 Summary:")
 print(f"   • Total components: {count}")
 print(f"   • Vector embeddings: ✅ Working")
-print(f"   • Indexes: ✅ Created")
+print(f"   • Vector index: {index_plan['method']} ({index_action})")
 print(f"   • Search function: ✅ Ready")
 print("\n🎯 Next step: Run test_db_search.py to test database retrieval")
\ No newline at end of file
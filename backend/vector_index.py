@@ -0,0 +1,213 @@
+"""
+Phase 2: Size-aware ANN index management for components.embedding
+Picks the vector index from the current row count and (re)builds it
+concurrently, so searches keep running while it is replaced:
+
+- fewer than EXACT_MAX_ROWS rows: no ANN index (exact scan, 100% recall)
+- up to HNSW_MAX_ROWS rows:        HNSW, m / ef_construction grow with size
+- beyond that:                     IVFFlat, lists = sqrt(rows)
+
+The chosen plan (and the row count it was built for) is stored as a JSON
+comment on the index; PgvectorBackend reads it to pick default
+ivfflat.probes / hnsw.ef_search.
+
+Usage: python vector_index.py [--method auto|hnsw|ivfflat|none] [--force] [--dry-run]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from datetime import datetime, timezone
+
+INDEX_NAME = "idx_embedding"
+
+EXACT_MAX_ROWS = int(os.getenv('VECTOR_INDEX_EXACT_MAX_ROWS', '10000'))
+HNSW_MAX_ROWS = int(os.getenv('VECTOR_INDEX_HNSW_MAX_ROWS', '1000000'))
+
+# Rebuild once the table has grown or shrunk by this factor since the build
+REBUILD_GROWTH_FACTOR = 2.0
+
+# pgvector's default hnsw.ef_search
+DEFAULT_EF_SEARCH = 40
+
+
+def plan_index(row_count, method="auto"):
+    """Index method and build parameters for a table of `row_count` rows"""
+    if method == "auto":
+        if row_count < EXACT_MAX_ROWS:
+            method = "none"
+        elif row_count <= HNSW_MAX_ROWS:
+            method = "hnsw"
+        else:
+            method = "ivfflat"
+
+    if method == "none":
+        return {"method": "none", "params": {}}
+
+    if method == "hnsw":
+        if row_count <= 100_000:
+            params = {"m": 16, "ef_construction": 64}
+        else:
+            params = {"m": 24, "ef_construction": 128}
+        return {"method": "hnsw", "params": params, "ef_search": DEFAULT_EF_SEARCH}
+
+    if method == "ivfflat":
+        # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+        if row_count <= 1_000_000:
+            lists = max(1, row_count // 1000)
+        else:
+            lists = int(math.sqrt(row_count))
+        return {"method": "ivfflat", "params": {"lists": lists}, "probes": max(1, round(math.sqrt(lists)))}
+
+    raise ValueError(f"Unknown index method: {method!r}")
+
+
+def parse_index(indexdef, comment=None):
+    """Current index description from pg_indexes.indexdef (+ our comment)"""
+    if indexdef is None:
+        return {"method": "none", "params": {}}
+
+    if comment:
+        try:
+            return json.loads(comment)
+        except ValueError:
+            pass
+
+    # Index created outside this tool (e.g. the original setup_database.py)
+    method_match = re.search(r'USING (\w+)', indexdef)
+    method = method_match.group(1) if method_match else "unknown"
+    params = {key: int(value) for key, value in re.findall(r"(\w+)='?(\d+)'?", indexdef)}
+    info = {"method": method, "params": params}
+    if method == "ivfflat" and "lists" in params:
+        info["probes"] = max(1, round(math.sqrt(params["lists"])))
+    elif method == "hnsw":
+        info["ef_search"] = DEFAULT_EF_SEARCH
+    return info
+
+
+# Resolved through search_path, like the unqualified table names used elsewhere
+INDEX_INFO_SQL = f"""
+    SELECT i.indexdef,
+           obj_description(format('%I.%I', i.schemaname, i.indexname)::regclass, 'pg_class')
+    FROM pg_indexes i
+    WHERE i.schemaname = current_schema()
+      AND i.tablename = 'components' AND i.indexname = '{INDEX_NAME}';
+"""
+
+
+def current_index(cursor):
+    cursor.execute(INDEX_INFO_SQL)
+    row = cursor.fetchone()
+    return parse_index(*row) if row else parse_index(None)
+
+
+def needs_rebuild(current, plan, row_count):
+    if current["method"] != plan["method"]:
+        return True
+    if plan["method"] == "none":
+        return False
+    if current.get("params") != plan["params"] and plan["method"] == "hnsw":
+        return True
+    built_for = current.get("rows")
+    if not built_for:
+        return True
+    ratio = max(row_count, 1) / max(built_for, 1)
+    return ratio >= REBUILD_GROWTH_FACTOR or ratio <= 1 / REBUILD_GROWTH_FACTOR
+
+
+def build_index(conn, plan, row_count, schema=None):
+    """Replace idx_embedding without blocking reads or writes.
+
+    Needs an autocommit connection (CONCURRENTLY cannot run in a transaction).
+    With `schema`, every statement is qualified with it: an unqualified
+    DROP INDEX would otherwise fall through search_path to another schema's
+    index when this one has none yet.
+    """
+    prefix = f"{schema}." if schema else ""
+    cursor = conn.cursor()
+    cursor.execute(f"SET maintenance_work_mem = '{os.getenv('VECTOR_INDEX_MAINTENANCE_WORK_MEM', '512MB')}';")
+
+    if plan["method"] == "none":
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {prefix}{INDEX_NAME};")
+        cursor.close()
+        return
+
+    # Leftover from an interrupted build would be INVALID; start clean
+    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {prefix}{INDEX_NAME}_new;")
+
+    options = ", ".join(f"{key} = {value}" for key, value in plan["params"].items())
+    cursor.execute(f"""
+        CREATE INDEX CONCURRENTLY {INDEX_NAME}_new ON {prefix}components
+        USING {plan['method']} (embedding vector_cosine_ops)
+        WITH ({options});
+    """)
+    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {prefix}{INDEX_NAME};")
+    cursor.execute(f"ALTER INDEX {prefix}{INDEX_NAME}_new RENAME TO {INDEX_NAME};")
+
+    comment = dict(plan, rows=row_count, built_at=datetime.now(timezone.utc).isoformat())
+    cursor.execute(f"COMMENT ON INDEX {prefix}{INDEX_NAME} IS %s;", (json.dumps(comment),))
+    cursor.close()
+
+
+def ensure_index(conn, method="auto", force=False, dry_run=False):
+    """Rebuild the ANN index if the table outgrew it. Returns (action, plan, row_count)"""
+    conn.commit()  # autocommit can only be switched outside a transaction
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM components;")
+    row_count = cursor.fetchone()[0]
+    current = current_index(cursor)
+    cursor.close()
+
+    plan = plan_index(row_count, method)
+    if not force and not needs_rebuild(current, plan, row_count):
+        return "unchanged", current, row_count
+    if dry_run:
+        return "would rebuild", plan, row_count
+
+    build_index(conn, plan, row_count)
+    return "rebuilt", plan, row_count
+
+
+def main():
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Manage the components.embedding ANN index")
+    parser.add_argument('--method', default='auto', choices=['auto', 'hnsw', 'ivfflat', 'none'])
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the current index still fits")
+    parser.add_argument('--dry-run', action='store_true', help="Only print the plan")
+    args = parser.parse_args()
+
+    print("📐 Vector Index Management")
+    print("=" * 80 + "\n")
+
+    DATABASE_URL = os.getenv('DATABASE_URL')
+    if not DATABASE_URL:
+        print("❌ ERROR: DATABASE_URL not found in .env file")
+        exit(1)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM components;")
+    print(f"📊 components: {cursor.fetchone()[0]} rows")
+    print(f"📌 Current index: {json.dumps(current_index(cursor))}\n")
+    cursor.close()
+
+    print("🔎 Checking index against row count (rebuilds run concurrently)...")
+    action, plan, row_count = ensure_index(conn, method=args.method, force=args.force, dry_run=args.dry_run)
+    conn.close()
+
+    print(f"✅ {action}: {plan['method']} {json.dumps(plan.get('params', {}))} for {row_count} rows")
+    if plan.get("probes"):
+        print(f"   Default ivfflat.probes: {plan['probes']}")
+    if plan.get("ef_search"):
+        print(f"   Default hnsw.ef_search: {plan['ef_search']}")
+
+
+if __name__ == "__main__":
+    main()